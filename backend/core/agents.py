@@ -0,0 +1,185 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+from swarm import Swarm
+
+from core.llm import openai_client
+from core.response_cache import response_cache
+
+load_dotenv()
+
+# Swarm's client.run is blocking, so agent calls are pushed onto a bounded
+# thread pool and every model gets its own in-flight limit.
+AGENT_MAX_WORKERS = int(os.getenv("AGENT_MAX_WORKERS", "32"))
+AGENT_MODEL_CONCURRENCY = int(os.getenv("AGENT_MODEL_CONCURRENCY", "16"))
+
+client = Swarm(client=openai_client)
+
+_executor = ThreadPoolExecutor(max_workers=AGENT_MAX_WORKERS, thread_name_prefix="agent")
+_model_limits = {}
+
+
+def _model_limit(model):
+    """Per-model semaphore, e.g. AGENT_CONCURRENCY_GPT_4O=8 overrides the default."""
+    if model not in _model_limits:
+        env_key = "AGENT_CONCURRENCY_" + "".join(c if c.isalnum() else "_" for c in model).upper()
+        _model_limits[model] = asyncio.Semaphore(int(os.getenv(env_key, AGENT_MODEL_CONCURRENCY)))
+    return _model_limits[model]
+
+
+def _release_when_done(limit, future):
+    """Free a model slot once the worker thread behind ``future`` is finished.
+
+    A cancelled or timed-out caller stops waiting, but the Swarm call keeps
+    running on its thread, so the slot must stay taken until then.
+    """
+    loop = asyncio.get_running_loop()
+
+    def release(_):
+        try:
+            loop.call_soon_threadsafe(limit.release)
+        except RuntimeError:
+            pass  # the loop is closed, nothing left to limit
+
+    future.add_done_callback(release)
+
+
+async def run_agent(agent, messages, **kwargs):
+    """Async equivalent of ``client.run(agent=..., messages=...)``."""
+    limit = _model_limit(agent.model)
+    await limit.acquire()
+    try:
+        future = _executor.submit(lambda: client.run(agent=agent, messages=messages, **kwargs))
+    except BaseException:
+        limit.release()
+        raise
+    _release_when_done(limit, future)
+    # Cancelling the wrapper only cancels the call if it has not started yet
+    return await asyncio.wrap_future(future)
+
+
+async def iterate_in_executor(make_iterator, limit=None):
+    """Consume a blocking iterator on the agent thread pool, item by item.
+
+    An acquired ``limit`` semaphore is released when the producer thread ends.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stopped = threading.Event()
+    end = object()
+
+    def produce():
+        try:
+            for item in make_iterator():
+                if stopped.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, (item, None))
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, (end, e))
+        else:
+            loop.call_soon_threadsafe(queue.put_nowait, (end, None))
+
+    try:
+        worker = _executor.submit(produce)
+    except BaseException:
+        if limit is not None:
+            limit.release()
+        raise
+    if limit is not None:
+        _release_when_done(limit, worker)
+    try:
+        while True:
+            item, error = await queue.get()
+            if error is not None:
+                raise error
+            if item is end:
+                return
+            yield item
+    finally:
+        # Lets the producer thread stop early when the client goes away
+        stopped.set()
+
+
+async def stream_agent(agent, messages, **kwargs):
+    """Stream an agent run as text deltas.
+
+    The last item yielded is the final Swarm ``Response`` so callers can
+    persist exactly what ``run_agent`` would have returned.
+    """
+    limit = _model_limit(agent.model)
+    await limit.acquire()
+    # The producer thread releases the slot, even after the client has gone
+    chunks = iterate_in_executor(
+        lambda: client.run(agent=agent, messages=messages, stream=True, **kwargs),
+        limit=limit,
+    )
+    async for chunk in chunks:
+        if "response" in chunk:
+            yield chunk["response"]
+        elif chunk.get("content"):
+            yield chunk["content"]
+
+
+async def agent_reply(agent, messages, cache_name=None):
+    """Reply text of an agent run, served from the response cache when the
+    ``cache_name`` agent is opted in."""
+    if cache_name is None or not response_cache.enabled(cache_name):
+        response = await run_agent(agent, messages)
+        return response.messages[-1]["content"]
+
+    prompt = messages[-1]["content"]
+    reply = await response_cache.get(cache_name, prompt)
+    if reply is None:
+        response = await run_agent(agent, messages)
+        reply = response.messages[-1]["content"]
+        await response_cache.put(cache_name, prompt, reply)
+    return reply
+
+
+def shutdown_agents():
+    _executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def run_agents_concurrently(jobs, timeout=None, cache_prefix=None):
+    """Run several independent agents at once under one shared timeout.
+
+    ``jobs`` maps a name to ``(agent, messages)``. Returns three dicts keyed
+    by name: the reply text of every agent that finished, the error of every
+    agent that failed or timed out, and the wall time of each call in seconds.
+    With ``cache_prefix`` each job may be answered from the response cache
+    under ``<cache_prefix>_<name>``.
+    """
+    loop = asyncio.get_running_loop()
+    timings = {}
+
+    async def timed(name, agent, messages):
+        start = loop.time()
+        try:
+            cache_name = f"{cache_prefix}_{name}" if cache_prefix else None
+            return await agent_reply(agent, messages, cache_name=cache_name)
+        finally:
+            timings[name] = loop.time() - start
+
+    tasks = {
+        asyncio.create_task(timed(name, agent, messages)): name
+        for name, (agent, messages) in jobs.items()
+    }
+    started = loop.time()
+    done, pending = await asyncio.wait(tasks, timeout=timeout)
+
+    results, errors = {}, {}
+    for task in pending:
+        task.cancel()
+        name = tasks[task]
+        errors[name] = f"timed out after {timeout}s"
+        timings[name] = loop.time() - started
+    for task in done:
+        name = tasks[task]
+        if task.exception() is not None:
+            errors[name] = str(task.exception())
+        else:
+            results[name] = task.result()
+    return results, errors, dict(timings)
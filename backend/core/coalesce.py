@@ -0,0 +1,119 @@
+import asyncio
+import time
+
+
+class _Slot:
+    def __init__(self):
+        self.run = None  # callable for the latest snapshot not started yet
+        self.waiting = []  # (future, since) of callers for a run not started yet
+        self.served = []  # (future, since) of callers the in-flight run answers
+        self.last_start = float("-inf")
+        self.task = None
+        self.driver = None
+
+
+class LatestOnly:
+    """Coalesces calls per key so only the latest snapshot is worked on.
+
+    Meant for endpoints polled while the user types. Per key at most one
+    call runs at a time; the first starts immediately and later ones start
+    at least ``min_interval`` seconds after the previous start. A newer
+    snapshot replaces one still waiting to start and cancels a running one,
+    and the callers of replaced or cancelled snapshots receive the result
+    of the newer one. Once a running call's oldest caller has waited
+    ``max_wait`` seconds it is left to finish, so continuous typing still
+    gets feedback.
+    """
+
+    def __init__(self, min_interval, max_wait):
+        self.min_interval = min_interval
+        self.max_wait = max_wait
+        self._slots = {}
+        self._last_sweep = time.monotonic()
+        self.requests = 0
+        self.runs = 0
+        self.superseded = 0
+        self.abandoned = 0
+
+    async def submit(self, key, run):
+        """Result of ``run()``, or of a newer snapshot's ``run`` submitted under ``key``."""
+        self.requests += 1
+        self._sweep()
+        loop = asyncio.get_running_loop()
+        slot = self._slots.setdefault(key, _Slot())
+        future = loop.create_future()
+        slot.run = run
+        slot.waiting.append((future, loop.time()))
+
+        if slot.task is not None and not slot.task.done():
+            oldest = min((since for _, since in slot.served), default=loop.time())
+            if loop.time() - oldest < self.max_wait and slot.task.cancel():
+                self.superseded += 1
+        if slot.driver is None or slot.driver.done():
+            slot.driver = asyncio.create_task(self._drive(slot))
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            future.cancel()
+            self._abandon(slot)
+            raise
+
+    async def _drive(self, slot):
+        loop = asyncio.get_running_loop()
+        while slot.run is not None:
+            delay = slot.last_start + self.min_interval - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            # Callers that went away are dropped, a cancelled run's callers stay on
+            slot.served = [(f, since) for f, since in slot.served + slot.waiting if not f.done()]
+            slot.waiting = []
+            run, slot.run = slot.run, None
+            if not slot.served:
+                continue
+            slot.last_start = loop.time()
+            self.runs += 1
+            slot.task = asyncio.create_task(run())
+            await asyncio.wait({slot.task})
+            if slot.task.cancelled():
+                continue
+            for future, _ in slot.served:
+                if future.done():
+                    continue  # the caller went away
+                if slot.task.exception() is not None:
+                    future.set_exception(slot.task.exception())
+                else:
+                    future.set_result(slot.task.result())
+            slot.served = []
+
+    def _abandon(self, slot):
+        # Cancel the running call once none of its callers is waiting for it
+        if slot.task is None or slot.task.done() or not slot.served:
+            return
+        if all(future.done() for future, _ in slot.served + slot.waiting) and slot.task.cancel():
+            self.abandoned += 1
+
+    def stats(self):
+        return {
+            "keys": len(self._slots),
+            "requests": self.requests,
+            "runs": self.runs,
+            # Started, then cancelled by a newer snapshot; these calls still cost tokens
+            "superseded": self.superseded,
+            # Started, then cancelled because every caller went away
+            "abandoned": self.abandoned,
+            # Requests answered without starting a call of their own
+            "saved": self.requests - self.runs,
+        }
+
+    def _sweep(self):
+        # Forget idle keys, at most once a minute
+        if time.monotonic() - self._last_sweep < 60:
+            return
+        self._last_sweep = time.monotonic()
+        now = asyncio.get_running_loop().time()
+        idle = [
+            key for key, slot in self._slots.items()
+            if (slot.driver is None or slot.driver.done()) and now - slot.last_start > self.min_interval
+        ]
+        for key in idle:
+            del self._slots[key]
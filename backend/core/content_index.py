@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import os
+
+import numpy as np
+
+from core.db import get_db
+from core.embeddings import embeddings
+from core.response_cache import normalize_prompt
+
+logger = logging.getLogger(__name__)
+
+# Cosine similarity of title + prompt needed to reuse content; empty disables reuse
+CONTENT_REUSE_SIMILARITY = os.getenv("CONTENT_REUSE_SIMILARITY", "0.95")
+# Seconds between background checks for public content created by other processes
+CONTENT_REUSE_REFRESH = int(os.getenv("CONTENT_REUSE_REFRESH", "60"))
+# Newest public contents held in the index, bounding its memory (about 6 KB each)
+CONTENT_REUSE_MAX_ENTRIES = int(os.getenv("CONTENT_REUSE_MAX_ENTRIES", "50000"))
+
+# Only complete content is worth reusing
+_REUSABLE = (
+    'public = true AND "contentTheory" IS NOT NULL '
+    'AND "contentCodes" IS NOT NULL AND "contentSyntax" IS NOT NULL'
+)
+
+
+def reuse_text(title, prompt):
+    return normalize_prompt(f"{title}\n{prompt}")
+
+
+class ContentIndex:
+    """Embedding index of public content, consulted before generating new content.
+
+    Title and prompt of the newest ``max_entries`` complete public Content
+    rows are embedded (through the shared embedding cache) and held as a
+    normalised matrix, so a lookup is one query embedding and a matrix
+    product. The index is built and refreshed by a background task started
+    from the app lifespan; until the first build finishes lookups find nothing.
+    """
+
+    def __init__(self, embeddings, similarity, refresh_interval, max_entries):
+        self.embeddings = embeddings
+        self.similarity = similarity
+        self.refresh_interval = refresh_interval
+        self.max_entries = max_entries
+        # (IDs, matrix) replaced as a whole so lookups never see a half update
+        self._index = ([], None)
+        self._newest = None  # createdAt of the newest row read from the database
+        self._task = None
+        self.ready = False
+        self.lookups = 0
+        self.matches = 0
+        self.skipped = 0
+
+    @property
+    def enabled(self):
+        return self.similarity is not None
+
+    def start(self):
+        """Build the index in the background and keep it fresh. Called from the app lifespan."""
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def match(self, title, prompt):
+        """``(content ID, similarity)`` of the closest public content above the threshold, or None."""
+        self.lookups += 1
+        ids, matrix = self._index
+        if matrix is None:
+            if not self.ready:
+                self.skipped += 1
+            return None
+        query = await self._embed([reuse_text(title, prompt)])
+        scores = matrix @ query[0]
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity:
+            return None
+        self.matches += 1
+        return ids[best], float(scores[best])
+
+    async def add(self, rows):
+        """Index content just created by this process, as dicts with id, title and prompt."""
+        if not self.ready:
+            return  # the build picks it up
+        await self._add(rows)
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "ready": self.ready,
+            "indexed": len(self._index[0]),
+            "max_entries": self.max_entries,
+            "similarity": self.similarity,
+            "lookups": self.lookups,
+            "skipped_not_ready": self.skipped,
+            "matches": self.matches,
+        }
+
+    async def _run(self):
+        while True:
+            try:
+                await self._refresh(await get_db())
+                self.ready = True
+            except Exception:
+                logger.exception("Refreshing the content reuse index failed")
+            await asyncio.sleep(self.refresh_interval)
+
+    async def _refresh(self, db):
+        sql = f'SELECT id, title, prompt, "createdAt" FROM "Content" WHERE {_REUSABLE}'
+        params = []
+        if self._newest is not None:
+            # >= so rows sharing the newest timestamp are not missed, known IDs are skipped;
+            # createdAt is stored in UTC so dropping the offset in the cast is exact
+            sql += ' AND "createdAt" >= $1::timestamp'
+            params.append(self._newest)
+        params.append(self.max_entries)
+        rows = await db.query_raw(sql + f' ORDER BY "createdAt" DESC, id DESC LIMIT ${len(params)}', *params)
+        rows.reverse()
+        if rows:
+            self._newest = rows[-1]["createdAt"]
+        await self._add(rows)
+
+    async def _add(self, rows):
+        known = set(self._index[0])
+        rows = [row for row in rows if row["id"] not in known]
+        if not rows:
+            return
+        vectors = await self._embed([reuse_text(row["title"], row["prompt"]) for row in rows])
+        # Re-read after the embedding, a concurrent add may have extended the index
+        ids, matrix = self._index
+        known = set(ids)
+        fresh = [i for i, row in enumerate(rows) if row["id"] not in known]
+        if not fresh:
+            return
+        ids = ids + [rows[i]["id"] for i in fresh]
+        matrix = vectors[fresh] if matrix is None else np.vstack([matrix, vectors[fresh]])
+        # Rows arrive oldest first, so the oldest are dropped past the cap
+        self._index = (ids[-self.max_entries:], matrix[-self.max_entries:])
+        logger.info("Indexed %d public contents for reuse", len(fresh))
+
+    async def _embed(self, texts):
+        vectors = np.asarray(await asyncio.to_thread(self.embeddings.embed_documents, texts), dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
+
+
+content_index = ContentIndex(
+    embeddings=embeddings,
+    similarity=float(CONTENT_REUSE_SIMILARITY) if CONTENT_REUSE_SIMILARITY else None,
+    refresh_interval=CONTENT_REUSE_REFRESH,
+    max_entries=CONTENT_REUSE_MAX_ENTRIES,
+)
@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import os
+from datetime import timedelta
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from dotenv import load_dotenv
+from prisma import Prisma
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Pool settings are passed to the Prisma query engine through the connection
+# string, see https://pris.ly/d/connection-pool
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "10"))
+DB_QUERY_TIMEOUT = float(os.getenv("DB_QUERY_TIMEOUT", "30"))
+# Seconds between background health checks that reconnect a dead engine, 0 disables
+DB_HEALTH_INTERVAL = float(os.getenv("DB_HEALTH_INTERVAL", "30"))
+
+_db = None
+_lock = asyncio.Lock()
+
+
+def _pooled_database_url():
+    """Return DATABASE_URL with the pool settings added to its query string."""
+    url = os.getenv("DATABASE_URL")
+    if not url:
+        return None
+
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query))
+    query.setdefault("connection_limit", str(DB_POOL_SIZE))
+    query.setdefault("pool_timeout", str(DB_POOL_TIMEOUT))
+    query.setdefault("connect_timeout", str(DB_CONNECT_TIMEOUT))
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+def _create_client():
+    url = _pooled_database_url()
+    return Prisma(
+        datasource={"url": url} if url else None,
+        connect_timeout=timedelta(seconds=DB_CONNECT_TIMEOUT),
+        http={"timeout": DB_QUERY_TIMEOUT},
+    )
+
+
+async def connect_db():
+    """Open the shared client. Called once from the app lifespan."""
+    global _db
+    async with _lock:
+        if _db is None:
+            _db = _create_client()
+        if not _db.is_connected():
+            await _db.connect()
+    return _db
+
+
+async def disconnect_db():
+    """Close the shared client. Called once on app shutdown."""
+    global _db
+    async with _lock:
+        if _db is not None and _db.is_connected():
+            await _db.disconnect()
+        _db = None
+
+
+async def reconnect_db():
+    """Drop the current query engine and open a fresh one."""
+    global _db
+    async with _lock:
+        if _db is not None and _db.is_connected():
+            try:
+                await _db.disconnect()
+            except Exception:
+                logger.exception("Error while disconnecting stale database client")
+        _db = _create_client()
+        await _db.connect()
+    return _db
+
+
+async def check_db_health():
+    """Run a trivial query and reconnect once if it fails."""
+    try:
+        db = await get_db()
+        await db.query_raw("SELECT 1")
+        return True
+    except Exception:
+        logger.warning("Database health check failed, reconnecting", exc_info=True)
+
+    try:
+        db = await reconnect_db()
+        await db.query_raw("SELECT 1")
+        return True
+    except Exception:
+        logger.exception("Database reconnect failed")
+        return False
+
+
+async def monitor_db(interval=DB_HEALTH_INTERVAL):
+    """Run check_db_health every ``interval`` seconds. Started from the app lifespan.
+
+    A crashed query engine still reports is_connected(), so without this the
+    client is only replaced when something polls /health.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await check_db_health()
+        except Exception:
+            logger.exception("Database health check crashed")
+
+
+async def get_db():
+    """FastAPI dependency returning the shared, already connected client."""
+    if _db is not None and _db.is_connected():
+        return _db
+    # Lifespan did not run (e.g. scripts) or the engine went away.
+    return await connect_db()
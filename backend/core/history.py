@@ -0,0 +1,164 @@
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from core.llm import get_llm
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - tiktoken ships with langchain_openai
+    tiktoken = None
+
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "3000"))
+# Most recent messages always sent verbatim
+HISTORY_RECENT_TURNS = int(os.getenv("HISTORY_RECENT_TURNS", "6"))
+HISTORY_SUMMARY_CACHE_SIZE = int(os.getenv("HISTORY_SUMMARY_CACHE_SIZE", "1024"))
+
+SUMMARY_PREFIX = "Summary of the earlier conversation: "
+
+_encodings = {}
+
+
+def _encoding(model):
+    if model not in _encodings:
+        encoding = None
+        if tiktoken is not None:
+            try:
+                try:
+                    encoding = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    encoding = tiktoken.get_encoding("o200k_base" if model.startswith("gpt-4o") else "cl100k_base")
+            except Exception:
+                # tiktoken downloads its BPE files on first use, which fails offline
+                logger.warning("No tokenizer for %s, estimating token counts", model)
+        _encodings[model] = encoding
+    return _encodings[model]
+
+
+def count_tokens(text, model):
+    """Token count for ``model``, or roughly four characters per token without tiktoken."""
+    encoding = _encoding(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text))
+
+
+def history_tokens(messages, model):
+    # Each chat message carries a few tokens of role/framing overhead
+    return sum(count_tokens(msg.content, model) + 4 for msg in messages)
+
+
+def token_budget(model):
+    """Per-model budget, e.g. HISTORY_TOKEN_BUDGET_GPT_4O=6000 overrides the default."""
+    env_key = "HISTORY_TOKEN_BUDGET_" + "".join(c if c.isalnum() else "_" for c in model).upper()
+    return int(os.getenv(env_key, HISTORY_TOKEN_BUDGET))
+
+
+def _prefix_hashes(messages):
+    """Rolling hash of every prefix, so ``hashes[i]`` identifies ``messages[:i + 1]``."""
+    hashes = []
+    digest = ""
+    for msg in messages:
+        digest = hashlib.sha256(f"{digest}\0{msg.type}\0{msg.content}".encode("utf-8")).hexdigest()
+        hashes.append(digest)
+    return hashes
+
+
+def _transcript(messages):
+    return "\n".join(
+        f"{'Tutor' if isinstance(msg, AIMessage) else 'Learner'}: {msg.content}" for msg in messages
+    )
+
+
+class HistoryManager:
+    """Fits chat history into a per-model token budget.
+
+    The last ``recent_turns`` messages are kept verbatim and everything older
+    is folded into a rolling summary. Summaries are cached by a hash of the
+    history prefix they cover, so each turn only summarizes the messages that
+    fell out of the window since the previous turn.
+    """
+
+    def __init__(self, recent_turns, cache_size):
+        self.recent_turns = recent_turns
+        self.cache_size = cache_size
+        self._summaries = OrderedDict()  # prefix hash -> summary text
+        self.requests = 0
+        self.summarized = 0
+        self.summary_cache_hits = 0
+        self.tokens_saved = 0
+
+    async def fit(self, messages, model):
+        """Return ``(messages to send, tokens saved)`` for ``model``."""
+        self.requests += 1
+        budget = token_budget(model)
+        original = history_tokens(messages, model)
+        if original <= budget or len(messages) <= 1:
+            return messages, 0
+
+        # Keep as many recent messages as fit, up to recent_turns, and at least one
+        keep = min(self.recent_turns, len(messages) - 1)
+        while keep > 1 and history_tokens(messages[-keep:], model) > budget:
+            keep -= 1
+        older, recent = messages[:-keep], messages[-keep:]
+
+        summary = await self._summary(older, model, budget - history_tokens(recent, model))
+        fitted = [SystemMessage(content=SUMMARY_PREFIX + summary)] + recent
+        saved = max(original - history_tokens(fitted, model), 0)
+        self.tokens_saved += saved
+        return fitted, saved
+
+    async def _summary(self, older, model, remaining):
+        hashes = _prefix_hashes(older)
+        if hashes[-1] in self._summaries:
+            self._summaries.move_to_end(hashes[-1])
+            self.summary_cache_hits += 1
+            return self._summaries[hashes[-1]]
+
+        # Extend the longest already summarized prefix instead of starting over
+        previous, start = "", 0
+        for i in range(len(hashes) - 2, -1, -1):
+            if hashes[i] in self._summaries:
+                previous, start = self._summaries[hashes[i]], i + 1
+                self.summary_cache_hits += 1
+                break
+
+        words = max(min(remaining * 3 // 4, 400), 60)
+        prompt = (
+            f"Condense this tutoring conversation into at most {words} words. Keep the topic, "
+            "what has been explained, questions asked, the learner's answers and whether they "
+            "were correct, and anything still left to cover.\n\n"
+        )
+        if previous:
+            prompt += f"Summary so far:\n{previous}\n\nNew messages:\n"
+        prompt += _transcript(older[start:])
+
+        response = await get_llm(model).ainvoke([HumanMessage(content=prompt)])
+        summary = response.content.strip()
+        self.summarized += 1
+
+        self._summaries[hashes[-1]] = summary
+        while len(self._summaries) > self.cache_size:
+            self._summaries.popitem(last=False)
+        return summary
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "summarized": self.summarized,
+            "summary_cache_hits": self.summary_cache_hits,
+            "cached_summaries": len(self._summaries),
+            "tokens_saved": self.tokens_saved,
+            "tokenizers": {model: "tiktoken" if encoding else "estimate" for model, encoding in _encodings.items()},
+        }
+
+
+history_manager = HistoryManager(
+    recent_turns=HISTORY_RECENT_TURNS,
+    cache_size=HISTORY_SUMMARY_CACHE_SIZE,
+)
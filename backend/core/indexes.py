@@ -0,0 +1,386 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from typing import Any, List
+
+import chromadb
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.vectorstores import Chroma
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.pydantic_v1 import PrivateAttr
+from langchain_core.retrievers import BaseRetriever
+
+from core.embeddings import embeddings
+from core.loaders import fetch, fetch_concurrently
+
+logger = logging.getLogger(__name__)
+
+VECTORSTORE_DIR = os.getenv("VECTORSTORE_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), ".vectorstores"))
+
+# Chunks embedded per Chroma insert, progress is reported after each batch
+INDEX_EMBED_BATCH = int(os.getenv("INDEX_EMBED_BATCH", "128"))
+
+# text-embedding-ada-002 vectors are 1536 float32 values
+EMBEDDING_BYTES = 1536 * 4
+
+# Each chunking profile gets its own collections, so the same URL indexed
+# for /topics and for /newcontent does not mix chunk sizes.
+SPLITTERS = {
+    "default": RecursiveCharacterTextSplitter(),
+    "tutoring": RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200),
+}
+
+
+def _sha256(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def content_hash(documents):
+    """Hash of the fetched text, independent of loader metadata."""
+    digest = hashlib.sha256()
+    for document in documents:
+        digest.update(document.page_content.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def chunk_id(chunk):
+    """Content address of a chunk, used as its Chroma ID."""
+    return _sha256(chunk.page_content + "\0" + json.dumps(chunk.metadata, sort_keys=True, default=str))
+
+
+def estimate_size(document_chunks):
+    """Rough in-memory footprint of an indexed set of chunks."""
+    return sum(len(chunk.page_content) + EMBEDDING_BYTES for chunk in document_chunks)
+
+
+def _no_progress(counter, amount):
+    pass
+
+
+ManifestEntry = namedtuple(
+    "ManifestEntry", ["content_hash", "collection", "size", "etag", "last_modified", "checked_at"]
+)
+
+
+class IndexStore:
+    """Persistent Chroma collections, one per (source, chunking profile).
+
+    A small SQLite manifest maps each source to its collection, the hash of
+    its last fetched content and the HTTP validators it was served with, so
+    a restarted process reopens the collection from disk and a refresh can
+    be a conditional request. Chunks are stored under their content hash,
+    so a changed page only embeds the chunks that are new.
+    """
+
+    def __init__(self, path):
+        # _unload() reaches into the segment manager of chromadb 0.4.x
+        if not chromadb.__version__.startswith("0.4."):
+            raise RuntimeError(
+                f"IndexStore supports chromadb 0.4.x, found {chromadb.__version__}; "
+                "check IndexStore._unload against the new segment manager before upgrading"
+            )
+        os.makedirs(path, exist_ok=True)
+        self.client = chromadb.PersistentClient(path=path)
+        self.embeddings = embeddings
+        self._manifest_path = os.path.join(path, "manifest.sqlite3")
+        self._lock = threading.Lock()
+        self._source_locks = {}
+        self._refs = {}  # collection ID -> owners holding it loaded
+        self.not_modified = 0
+        self.unchanged = 0
+        self.updated = 0
+        self.chunks_added = 0
+        self.chunks_removed = 0
+        self.released = 0
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sources (
+                    source        TEXT NOT NULL,
+                    profile       TEXT NOT NULL,
+                    content_hash  TEXT NOT NULL,
+                    collection    TEXT NOT NULL,
+                    size          INTEGER NOT NULL,
+                    updated_at    REAL NOT NULL,
+                    etag          TEXT,
+                    last_modified TEXT,
+                    checked_at    REAL,
+                    PRIMARY KEY (source, profile)
+                )
+                """
+            )
+            # Manifests written before revalidation lack the validator columns
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(sources)")}
+            for column, kind in (("etag", "TEXT"), ("last_modified", "TEXT"), ("checked_at", "REAL")):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE sources ADD COLUMN {column} {kind}")
+
+    def _connect(self):
+        return sqlite3.connect(self._manifest_path, timeout=30)
+
+    def _source_lock(self, source, profile):
+        with self._lock:
+            return self._source_locks.setdefault((source, profile), threading.Lock())
+
+    def _manifest_entry(self, source, profile):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT content_hash, collection, size, etag, last_modified, checked_at "
+                "FROM sources WHERE source = ? AND profile = ?",
+                (source, profile),
+            ).fetchone()
+        return ManifestEntry(*row) if row else None
+
+    def _mark_checked(self, source, profile, etag, last_modified):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE sources SET etag = ?, last_modified = ?, checked_at = ? WHERE source = ? AND profile = ?",
+                (etag, last_modified, time.time(), source, profile),
+            )
+
+    def _open_collection(self, name):
+        return Chroma(client=self.client, collection_name=name, embedding_function=self.embeddings)
+
+    def _collection_exists(self, name):
+        try:
+            self.client.get_collection(name)
+            return True
+        except ValueError:
+            return False
+
+    def open(self, source, profile="default"):
+        """Reopen the stored collection for ``source`` without fetching it."""
+        entry = self._manifest_entry(source, profile)
+        if entry is None or not self._collection_exists(entry.collection):
+            return None
+        return self._open_collection(entry.collection), entry.size
+
+    def acquire(self, vectorstore):
+        """Count an owner, such as a cache entry or a retriever, keeping the collection loaded."""
+        collection_id = vectorstore._collection.id
+        with self._lock:
+            self._refs[collection_id] = self._refs.get(collection_id, 0) + 1
+
+    def release(self, vectorstore):
+        """Drop an owner taken with acquire(); the last one unloads the collection.
+
+        chromadb 0.4.22 keeps the HNSW index of every collection it opened
+        loaded for the life of the client and has no segment cache policy, so
+        dropping a store from a cache frees nothing unless it is unloaded here.
+        Unloaded segments reload from disk on next use.
+        """
+        collection_id = vectorstore._collection.id
+        # Held throughout so an acquire() cannot slip in before the unload
+        with self._lock:
+            count = self._refs.get(collection_id, 0) - 1
+            if count > 0:
+                self._refs[collection_id] = count
+                return
+            self._refs.pop(collection_id, None)
+            self._unload(collection_id)
+        self.released += 1
+
+    def _unload(self, collection_id):
+        manager = self.client._server._manager
+        with manager._lock:
+            for segment in manager._sysdb.get_segments(collection=collection_id):
+                instance = manager._instances.pop(segment["id"], None)
+                if instance is not None:
+                    instance.stop()
+            manager._segment_cache.pop(collection_id, None)
+            handles = getattr(manager, "_vector_instances_file_handle_cache", None)
+            if handles is not None:
+                instance = handles.cache.pop(collection_id, None)
+                if instance is not None:
+                    instance.close_persistent_index()
+
+    def checked_at(self, source, profile="default"):
+        """When ``source`` was last fetched or revalidated, or None."""
+        entry = self._manifest_entry(source, profile)
+        if entry is None:
+            return None
+        return entry.checked_at or 0.0
+
+    def build(self, source, documents, profile="default", progress=None, validators=(None, None)):
+        """Index fetched ``documents``, embedding only chunks not already stored.
+
+        ``validators`` are the ETag and Last-Modified the documents were
+        served with. ``progress(counter, amount)`` is called as chunks are
+        embedded.
+        """
+        progress = progress or _no_progress
+        digest = content_hash(documents)
+        entry = self._manifest_entry(source, profile)
+        if entry is not None and entry.content_hash == digest and self._collection_exists(entry.collection):
+            self._mark_checked(source, profile, *validators)
+            self.unchanged += 1
+            return self._open_collection(entry.collection), entry.size
+
+        # The collection name is stable per source, so updates happen in place
+        name = entry.collection if entry is not None else f"src-{_sha256(profile + ':' + source)[:16]}"
+        vectorstore = self._open_collection(name)
+        chunks = {chunk_id(chunk): chunk for chunk in SPLITTERS[profile].split_documents(documents)}
+        existing = set(vectorstore.get(include=[])["ids"])
+        stale = [id_ for id_ in existing if id_ not in chunks]
+        new = [id_ for id_ in chunks if id_ not in existing]
+
+        progress("chunks_total", len(new))
+        for start in range(0, len(stale), INDEX_EMBED_BATCH):
+            vectorstore.delete(ids=stale[start:start + INDEX_EMBED_BATCH])
+        for start in range(0, len(new), INDEX_EMBED_BATCH):
+            batch = new[start:start + INDEX_EMBED_BATCH]
+            vectorstore.add_documents([chunks[id_] for id_ in batch], ids=batch)
+            progress("chunks_embedded", len(batch))
+        size = estimate_size(chunks.values())
+
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sources "
+                "(source, profile, content_hash, collection, size, updated_at, etag, last_modified, checked_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (source, profile, digest, name, size, now, *validators, now),
+            )
+        self.updated += 1
+        self.chunks_added += len(new)
+        self.chunks_removed += len(stale)
+
+        logger.info(
+            "Indexed %s (%s): %d chunks added, %d removed, %d kept",
+            source, profile, len(new), len(stale), len(chunks) - len(new),
+        )
+        return vectorstore, size
+
+    def load(self, source, profile="default", progress=None):
+        """Open the stored index for ``source`` or fetch and build it."""
+        progress = progress or _no_progress
+        with self._source_lock(source, profile):
+            stored = self.open(source, profile)
+            if stored is None:
+                result = fetch(source)
+                progress("documents_fetched", len(result.documents))
+                stored = self.build(source, result.documents, profile, progress, result[1:])
+            progress("sources_ready", 1)
+            return stored
+
+    def revalidate(self, source, profile="default", progress=None):
+        """Conditionally re-fetch ``source`` and apply any change in place.
+
+        Returns ``(vectorstore, size, changed)``. An unchanged page costs one
+        304 round trip; a changed one only embeds its changed chunks.
+        """
+        progress = progress or _no_progress
+        with self._source_lock(source, profile):
+            entry = self._manifest_entry(source, profile)
+            stored = entry is not None and self._collection_exists(entry.collection)
+            result = fetch(source, entry.etag, entry.last_modified) if stored else fetch(source)
+            if result.documents is None:
+                self._mark_checked(source, profile, result.etag, result.last_modified)
+                self.not_modified += 1
+                progress("sources_ready", 1)
+                return self._open_collection(entry.collection), entry.size, False
+
+            progress("documents_fetched", len(result.documents))
+            changed = not stored or content_hash(result.documents) != entry.content_hash
+            vectorstore, size = self.build(source, result.documents, profile, progress, result[1:])
+            progress("sources_ready", 1)
+            return vectorstore, size, changed
+
+    def stats(self):
+        return {
+            "not_modified": self.not_modified,
+            "unchanged": self.unchanged,
+            "updated": self.updated,
+            "chunks_added": self.chunks_added,
+            "chunks_removed": self.chunks_removed,
+            "released": self.released,
+        }
+
+    def load_many(self, sources, profile="default", progress=None):
+        """``load`` for several sources, fetching the missing ones concurrently.
+
+        Fetched sources are split and embedded as they arrive rather than
+        after the slowest fetch. Results are returned in ``sources`` order.
+        """
+        progress = progress or _no_progress
+        loaded = {}
+        for source in dict.fromkeys(sources):
+            stored = self.open(source, profile)
+            if stored is not None:
+                loaded[source] = stored
+                progress("sources_ready", 1)
+
+        missing = [source for source in dict.fromkeys(sources) if source not in loaded]
+        for source, result, error in fetch_concurrently(missing):
+            if error is not None:
+                raise ValueError(f"Failed to load {source}: {error}") from error
+            progress("documents_fetched", len(result.documents))
+            with self._source_lock(source, profile):
+                # Another request may have indexed it while this one was fetching
+                loaded[source] = self.open(source, profile) or self.build(
+                    source, result.documents, profile, progress, result[1:]
+                )
+            progress("sources_ready", 1)
+
+        return [loaded[source] for source in sources]
+
+
+class MultiSourceRetriever(BaseRetriever):
+    """Retrieves the top ``k`` chunks across several per-source collections."""
+
+    vectorstores: List[Any]
+    # Source URL and estimated size behind each entry of ``vectorstores``
+    sources: List[str] = []
+    sizes: List[int] = []
+    k: int = 4
+    # Compiled chains over this retriever, see core.rag.get_rag_chain
+    _rag_chains: dict = PrivateAttr(default_factory=dict)
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        if not self.vectorstores:
+            return []
+        # Embed the query once and search every collection with the vector
+        embedding = self.vectorstores[0].embeddings.embed_query(query)
+        scored = []
+        for vectorstore in self.vectorstores:
+            scored.extend(
+                vectorstore.similarity_search_by_vector_with_relevance_scores(embedding, k=self.k)
+            )
+        # Chroma scores are distances, lower is closer
+        scored.sort(key=lambda pair: pair[1])
+        return [document for document, _ in scored[: self.k]]
+
+    def add_loaded(self, sources, loaded):
+        """Add ``(vectorstore, size)`` pairs for ``sources`` not already present."""
+        new = [(source, pair) for source, pair in zip(sources, loaded) if source not in self.sources]
+        # Lists are replaced rather than mutated, retrieval may be iterating them
+        self.vectorstores = self.vectorstores + [vectorstore for _, (vectorstore, _) in new]
+        self.sources = self.sources + [source for source, _ in new]
+        self.sizes = self.sizes + [size for _, (_, size) in new]
+        return [source for source, _ in new]
+
+    def remove_source(self, source):
+        """Stop searching ``source``; its collection stays on disk for reuse."""
+        index = self.sources.index(source)
+        self.vectorstores = self.vectorstores[:index] + self.vectorstores[index + 1:]
+        self.sources = self.sources[:index] + self.sources[index + 1:]
+        self.sizes = self.sizes[:index] + self.sizes[index + 1:]
+
+    @property
+    def size(self):
+        return sum(self.sizes)
+
+
+index_store = IndexStore(VECTORSTORE_DIR)
@@ -0,0 +1,194 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+
+from fastapi.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "100"))
+# Finished jobs stay pollable for this long
+JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", str(60 * 60)))
+JOB_MAX_FINISHED = int(os.getenv("JOB_MAX_FINISHED", "1000"))
+# Curricula take minutes each, so they run on their own workers and never
+# hold up website indexing on the shared queue
+CURRICULUM_JOB_WORKERS = int(os.getenv("CURRICULUM_JOB_WORKERS", "2"))
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class Job:
+    """A unit of background work with pollable status and progress counters."""
+
+    def __init__(self, kind, func, key=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.key = key
+        self.func = func
+        self.status = "queued"
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def done(self):
+        return self.status in ("succeeded", "failed")
+
+    def advance(self, counter, amount=1):
+        """Bump a progress counter, safe to call from worker threads."""
+        self.progress[counter] = self.progress.get(counter, 0) + amount
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": dict(self.progress),
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobQueue:
+    """Background jobs run by a fixed number of asyncio workers.
+
+    ``func`` is an async callable taking the job, so it can report progress,
+    and returning a JSON-serialisable result. Submitting a job whose ``key``
+    matches a queued or running job returns that job instead of a new one.
+    """
+
+    def __init__(self, workers, max_pending, result_ttl, max_finished):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self.max_finished = max_finished
+        self._queue = None
+        self._tasks = []
+        self._jobs = OrderedDict()  # id -> Job, in submission order
+        self._active = {}  # key -> Job
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.deduplicated = 0
+
+    def submit(self, kind, func, key=None):
+        self._prune()
+        if key is not None and key in self._active:
+            self.deduplicated += 1
+            return self._active[key]
+        self._start()
+        if self._queue.qsize() >= self.max_pending:
+            raise JobQueueFull(f"{self._queue.qsize()} jobs already waiting")
+
+        job = Job(kind, func, key)
+        self._jobs[job.id] = job
+        if key is not None:
+            self._active[key] = job
+        self._queue.put_nowait(job)
+        self.submitted += 1
+        return job
+
+    def get(self, job_id):
+        self._prune()
+        return self._jobs.get(job_id)
+
+    async def shutdown(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    def stats(self):
+        statuses = {}
+        for job in self._jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {
+            "workers": self.workers,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "jobs": statuses,
+            "submitted": self.submitted,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "deduplicated": self.deduplicated,
+        }
+
+    def _start(self):
+        # Workers are created on first use so they bind to the running loop
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                job.result = await job.func(job)
+                job.status = "succeeded"
+                self.succeeded += 1
+            except asyncio.CancelledError:
+                job.status = "failed"
+                job.error = "Cancelled"
+                raise
+            except Exception as e:
+                logger.exception("Job %s (%s) failed", job.id, job.kind)
+                job.status = "failed"
+                job.error = str(e)
+                self.failed += 1
+            finally:
+                job.finished_at = time.time()
+                job.func = None
+                if job.key is not None and self._active.get(job.key) is job:
+                    del self._active[job.key]
+                self._queue.task_done()
+
+    def _prune(self):
+        now = time.time()
+        finished = [job for job in self._jobs.values() if job.done]
+        excess = len(finished) - self.max_finished
+        for job in finished:
+            if excess > 0 or now - job.finished_at > self.result_ttl:
+                del self._jobs[job.id]
+                excess -= 1
+
+
+def accepted(job, message):
+    """202 response pointing the client at a job to poll via /jobs/{id}."""
+    return JSONResponse(status_code=202, content={"message": message, **job.to_dict()})
+
+
+job_queue = JobQueue(
+    workers=JOB_WORKERS,
+    max_pending=JOB_MAX_PENDING,
+    result_ttl=JOB_RESULT_TTL,
+    max_finished=JOB_MAX_FINISHED,
+)
+curriculum_queue = JobQueue(
+    workers=CURRICULUM_JOB_WORKERS,
+    max_pending=JOB_MAX_PENDING,
+    result_ttl=JOB_RESULT_TTL,
+    max_finished=JOB_MAX_FINISHED,
+)
+
+
+def find_job(job_id):
+    """Job with this ID from any queue, or None."""
+    for queue in (job_queue, curriculum_queue):
+        job = queue.get(job_id)
+        if job is not None:
+            return job
+    return None
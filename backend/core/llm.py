@@ -0,0 +1,39 @@
+import os
+
+import httpx
+import openai
+from dotenv import load_dotenv
+from langchain_openai import ChatOpenAI
+
+load_dotenv()
+
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "20"))
+LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "120"))
+# ChatOpenAI's own default model
+DEFAULT_CHAT_MODEL = "gpt-3.5-turbo"
+
+_limits = httpx.Limits(max_connections=LLM_MAX_CONNECTIONS, max_keepalive_connections=LLM_MAX_KEEPALIVE)
+
+# One keep-alive connection pool per process, shared by Swarm and LangChain
+openai_client = openai.OpenAI(
+    timeout=LLM_REQUEST_TIMEOUT,
+    http_client=httpx.Client(limits=_limits, timeout=LLM_REQUEST_TIMEOUT),
+)
+async_openai_client = openai.AsyncOpenAI(
+    timeout=LLM_REQUEST_TIMEOUT,
+    http_client=httpx.AsyncClient(limits=_limits, timeout=LLM_REQUEST_TIMEOUT),
+)
+
+_llms = {}
+
+
+def get_llm(model=DEFAULT_CHAT_MODEL):
+    """Shared ChatOpenAI instance for ``model`` on the pooled OpenAI client."""
+    if model not in _llms:
+        _llms[model] = ChatOpenAI(
+            model=model,
+            client=openai_client.chat.completions,
+            async_client=async_openai_client.chat.completions,
+        )
+    return _llms[model]
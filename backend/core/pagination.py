@@ -0,0 +1,91 @@
+import base64
+import binascii
+import json
+import os
+from datetime import datetime, timezone
+
+from fastapi import HTTPException
+
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", "20"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "100"))
+
+# Newest first, with the ID breaking ties between equal timestamps
+KEYSET_ORDER = [{"createdAt": "desc"}, {"id": "desc"}]
+
+
+def _as_utc(value):
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def encode_key(*values):
+    """Opaque cursor for a JSON-serialisable sort key."""
+    payload = json.dumps(values).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def decode_key(cursor, size):
+    """Sort key of ``size`` values from ``encode_key``, or a 400 for a bad cursor."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError(cursor)
+        return values
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def encode_cursor(created_at, id_):
+    return encode_key(_as_utc(created_at).isoformat(), id_)
+
+
+def decode_cursor(cursor):
+    """``(createdAt, id)`` of the last item of the previous page."""
+    created_at, id_ = decode_key(cursor, 2)
+    try:
+        return _as_utc(created_at), str(id_)
+    except (ValueError, TypeError, AttributeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset_where(cursor):
+    """Prisma filter for rows after ``cursor`` in KEYSET_ORDER."""
+    if not cursor:
+        return {}
+    created_at, id_ = decode_cursor(cursor)
+    return {"OR": [{"createdAt": {"lt": created_at}}, {"createdAt": created_at, "id": {"lt": id_}}]}
+
+
+def page(rows, limit, key=lambda row: (row.createdAt, row.id)):
+    """Trim a ``limit + 1`` fetch to one page and the cursor for the next."""
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {"items": rows, "nextCursor": encode_cursor(*key(rows[-1])) if has_more else None}
+
+
+async def summary_page(db, table, columns, where, params, limit, cursor):
+    """Keyset page of selected ``columns`` from ``table`` using raw SQL.
+
+    Only the listed columns are read, so large text columns never leave the
+    database. ``where`` is a SQL condition using ``$1``..``$n`` for
+    ``params``. ``columns`` must include ``id`` and ``createdAt``.
+    """
+    params = list(params)
+    conditions = [where]
+    if cursor:
+        created_at, id_ = decode_cursor(cursor)
+        # createdAt is stored as a UTC timestamp without time zone
+        params += [created_at.replace(tzinfo=None).isoformat(), id_]
+        conditions.append(f'("createdAt", id) < (${len(params) - 1}::timestamp, ${len(params)})')
+    params.append(limit + 1)
+    columns_sql = ", ".join(f'"{column}"' for column in columns)
+    sql = (
+        f'SELECT {columns_sql} FROM "{table}" '
+        f'WHERE {" AND ".join(conditions)} '
+        f'ORDER BY "createdAt" DESC, id DESC LIMIT ${len(params)}'
+    )
+    rows = await db.query_raw(sql, *params)
+    return page(rows, limit, key=lambda row: (row["createdAt"], row["id"]))
@@ -0,0 +1,122 @@
+import os
+from collections import namedtuple
+
+from langchain.chains import create_history_aware_retriever, create_retrieval_chain
+from langchain.chains.combine_documents import create_stuff_documents_chain
+from langchain_core.messages import HumanMessage
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import RunnableBranch
+from langchain_core.vectorstores import VectorStore
+
+from core.llm import get_llm, DEFAULT_CHAT_MODEL
+
+# How retrieval treats the history-aware query rewrite:
+#   always - rewrite with the LLM whenever there is chat history
+#   never  - retrieve with the raw input
+#   auto   - skip the rewrite when there are no prior user turns or the
+#            endpoint sends a fixed template against a static seed history
+REWRITE_MODES = ("always", "never", "auto")
+RAG_REWRITE_MODE = os.getenv("RAG_REWRITE_MODE", "auto")
+
+RagVariant = namedtuple("RagVariant", ["name", "system_prompt", "rewrite_prompt", "model"])
+
+# Used by the /topics, /content and /quiz website endpoints
+WEB_QA = RagVariant(
+    name="web_qa",
+    system_prompt="Answer the user's questions based on the below context:\n\n{context}",
+    rewrite_prompt="Given the above conversation, generate a search query to look up in order to get information relevant to the conversation",
+    model=DEFAULT_CHAT_MODEL,
+)
+
+
+def rewrite_mode(endpoint):
+    """Rewrite mode for ``endpoint``, e.g. RAG_REWRITE_MODE_QUIZ_EVALUATE=never."""
+    env_key = "RAG_REWRITE_MODE_" + "".join(c if c.isalnum() else "_" for c in endpoint).upper()
+    mode = os.getenv(env_key, RAG_REWRITE_MODE)
+    if mode not in REWRITE_MODES:
+        raise ValueError(f"{env_key} must be one of {', '.join(REWRITE_MODES)}, got {mode!r}")
+    return mode
+
+
+def has_user_turns(chat_history):
+    return any(isinstance(msg, HumanMessage) and msg.content.strip() for msg in chat_history)
+
+
+class RewriteStats:
+    """Per-endpoint counts of rewritten and fast-path retrievals."""
+
+    def __init__(self):
+        self._endpoints = {}
+
+    def record(self, endpoint, mode, fast_path):
+        counts = self._endpoints.setdefault(endpoint, {"mode": mode, "rewritten": 0, "fast_path": 0})
+        counts["fast_path" if fast_path else "rewritten"] += 1
+
+    def stats(self):
+        return {
+            endpoint: dict(counts, fast_path_rate=counts["fast_path"] / (counts["fast_path"] + counts["rewritten"]))
+            for endpoint, counts in self._endpoints.items()
+        }
+
+
+rewrite_stats = RewriteStats()
+
+
+def build_retriever_chain(llm, retriever, variant, endpoint, templated):
+    rewrite_prompt = ChatPromptTemplate.from_messages([
+        MessagesPlaceholder(variable_name="chat_history"),
+        ("user", "{input}"),
+        ("user", variant.rewrite_prompt),
+    ])
+    rewrite_chain = create_history_aware_retriever(llm, retriever, rewrite_prompt)
+    direct_chain = (lambda x: x["input"]) | retriever
+    mode = rewrite_mode(endpoint)
+
+    def use_fast_path(inputs):
+        chat_history = inputs.get("chat_history") or []
+        if mode == "never" or not chat_history:
+            fast_path = True
+        elif mode == "always":
+            fast_path = False
+        else:
+            fast_path = templated or not has_user_turns(chat_history)
+        rewrite_stats.record(endpoint, mode, fast_path)
+        return fast_path
+
+    return RunnableBranch((use_fast_path, direct_chain), rewrite_chain).with_config(
+        run_name="chat_retriever_chain"
+    )
+
+
+def build_rag_chain(retriever, variant, endpoint, templated=False):
+    llm = get_llm(variant.model)
+    retriever_chain = build_retriever_chain(llm, retriever, variant, endpoint, templated)
+
+    answer_prompt = ChatPromptTemplate.from_messages([
+        ("system", variant.system_prompt),
+        MessagesPlaceholder(variable_name="chat_history"),
+        ("user", "{input}"),
+    ])
+    stuff_documents_chain = create_stuff_documents_chain(llm, answer_prompt)
+    return create_retrieval_chain(retriever_chain, stuff_documents_chain)
+
+
+def get_rag_chain(source, variant, endpoint, templated=False):
+    """Chain for a vector store or retriever, compiled once per variant and endpoint.
+
+    ``endpoint`` names the caller for its rewrite mode and stats. Pass
+    ``templated=True`` when the input is a fixed instruction sent against
+    a static seed history, so ``auto`` mode can retrieve with it directly.
+
+    Compiled chains are kept on the source itself, so they are released
+    together with it when the vector store cache or retriever registry
+    drops it.
+    """
+    chains = getattr(source, "_rag_chains", None)
+    if chains is None:
+        chains = source._rag_chains = {}
+    key = (variant.name, endpoint)
+    if key not in chains:
+        retriever = source.as_retriever() if isinstance(source, VectorStore) else source
+        chains[key] = build_rag_chain(retriever, variant, endpoint, templated)
+    return chains[key]
@@ -0,0 +1,234 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi.encoders import jsonable_encoder
+
+# "memory" caches per process, "sqlite" shares one cache file between the
+# worker processes of a host
+READ_CACHE_BACKEND = os.getenv("READ_CACHE_BACKEND", "memory")
+READ_CACHE_DB_PATH = os.getenv(
+    "READ_CACHE_DB_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "read_cache.sqlite3"),
+)
+READ_CACHE_MAX_ENTRIES = int(os.getenv("READ_CACHE_MAX_ENTRIES", "2048"))
+READ_CACHE_MAX_MB = int(os.getenv("READ_CACHE_MAX_MB", "128"))
+# Upper bound on staleness of embedded rows, such as a renamed user; 0 disables
+READ_CACHE_TTL = int(os.getenv("READ_CACHE_TTL", str(60 * 60)))
+
+# Invalidation tags
+TOPICS_PUBLIC = "topics:public"
+CONTENT_PUBLIC = "content:public"
+
+
+def topic_tag(topic_id):
+    return f"topic:{topic_id}"
+
+
+def content_tag(content_id):
+    return f"content:{content_id}"
+
+
+class MemoryReadCacheBackend:
+    """LRU of encoded responses held in this process."""
+
+    blocking = False
+
+    def __init__(self, max_entries, max_bytes, ttl):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # (tag, key) -> (value, size, stored_at)
+        self._bytes = 0
+        self.evictions = 0
+
+    def get(self, tag, key):
+        entry = self._entries.get((tag, key))
+        if entry is None:
+            return None
+        if self.ttl and time.monotonic() - entry[2] > self.ttl:
+            self._remove((tag, key))
+            return None
+        self._entries.move_to_end((tag, key))
+        return entry[0]
+
+    def put(self, tag, key, value, encoded):
+        if (tag, key) in self._entries:
+            self._remove((tag, key))
+        size = len(encoded)
+        self._entries[(tag, key)] = (value, size, time.monotonic())
+        self._bytes += size
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(self, tags):
+        stale = [entry_key for entry_key in self._entries if entry_key[0] in tags]
+        for entry_key in stale:
+            self._remove(entry_key)
+        return len(stale)
+
+    def usage(self):
+        return len(self._entries), self._bytes
+
+    def _remove(self, entry_key):
+        _, size, _ = self._entries.pop(entry_key)
+        self._bytes -= size
+
+
+class SqliteReadCacheBackend:
+    """Encoded responses in a SQLite file shared by every process on the host."""
+
+    blocking = True
+
+    def __init__(self, path, max_entries, max_bytes, ttl):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._path = path
+        self._local = threading.local()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.evictions = 0
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS read_cache (
+                    tag       TEXT NOT NULL,
+                    key       TEXT NOT NULL,
+                    value     TEXT NOT NULL,
+                    size      INTEGER NOT NULL,
+                    stored_at REAL NOT NULL,
+                    used_at   REAL NOT NULL,
+                    PRIMARY KEY (tag, key)
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS read_cache_used_at ON read_cache (used_at)")
+
+    def _connect(self):
+        # One connection per thread, calls arrive on worker threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def get(self, tag, key):
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT value, stored_at FROM read_cache WHERE tag = ? AND key = ?", (tag, key)
+        ).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        with conn:
+            if self.ttl and now - row[1] > self.ttl:
+                conn.execute("DELETE FROM read_cache WHERE tag = ? AND key = ?", (tag, key))
+                return None
+            conn.execute("UPDATE read_cache SET used_at = ? WHERE tag = ? AND key = ?", (now, tag, key))
+        return json.loads(row[0])
+
+    def put(self, tag, key, value, encoded):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO read_cache VALUES (?, ?, ?, ?, ?, ?)",
+                (tag, key, encoded, len(encoded), now, now),
+            )
+            count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM read_cache").fetchone()
+            # Drop least recently used rows until both limits hold, keeping the newest
+            for row_tag, row_key, size in conn.execute(
+                "SELECT tag, key, size FROM read_cache ORDER BY used_at"
+            ).fetchall():
+                if count <= 1 or (count <= self.max_entries and total <= self.max_bytes):
+                    break
+                conn.execute("DELETE FROM read_cache WHERE tag = ? AND key = ?", (row_tag, row_key))
+                count -= 1
+                total -= size
+                self.evictions += 1
+
+    def invalidate(self, tags):
+        with self._connect() as conn:
+            return conn.executemany("DELETE FROM read_cache WHERE tag = ?", [(tag,) for tag in tags]).rowcount
+
+    def usage(self):
+        return self._connect().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM read_cache").fetchone()
+
+
+class ReadCache:
+    """Read-through cache for database reads that rarely change.
+
+    Entries are grouped under tags, such as a public feed or one content row,
+    and writers invalidate the tags they affect. Loads racing with an
+    invalidation of their tag are returned but not stored, so a cached entry
+    never predates the last write. Values are JSON-encoded on store.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._generations = {}  # tag -> invalidation count
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def get_or_load(self, tag, key, loader):
+        """Cached value of ``loader()``; a None result is returned but not cached."""
+        value = await self._call(self.backend.get, tag, key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        generation = self._generations.get(tag, 0)
+        value = await loader()
+        if value is None:
+            return None
+        value = jsonable_encoder(value)
+        if self._generations.get(tag, 0) == generation:
+            await self._call(self.backend.put, tag, key, value, json.dumps(value))
+        return value
+
+    async def invalidate(self, *tags):
+        for tag in tags:
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+        self.invalidations += await self._call(self.backend.invalidate, set(tags))
+
+    def stats(self):
+        entries, size = self.backend.usage()
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": entries,
+            "bytes": size,
+            "max_entries": self.backend.max_entries,
+            "max_bytes": self.backend.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidated": self.invalidations,
+            "evictions": self.backend.evictions,
+        }
+
+    async def _call(self, method, *args):
+        if self.backend.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+
+def _backend():
+    limits = dict(max_entries=READ_CACHE_MAX_ENTRIES, max_bytes=READ_CACHE_MAX_MB * 1024 * 1024, ttl=READ_CACHE_TTL)
+    if READ_CACHE_BACKEND == "sqlite":
+        return SqliteReadCacheBackend(READ_CACHE_DB_PATH, **limits)
+    if READ_CACHE_BACKEND == "memory":
+        return MemoryReadCacheBackend(**limits)
+    raise ValueError(f"READ_CACHE_BACKEND must be memory or sqlite, got {READ_CACHE_BACKEND!r}")
+
+
+read_cache = ReadCache(_backend())
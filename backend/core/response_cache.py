@@ -0,0 +1,116 @@
+import asyncio
+import os
+import re
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from core.embeddings import embeddings
+
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2048"))
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", str(24 * 60 * 60)))
+# Agents whose replies may be shared between users, by cache name, e.g.
+# "topic,content_theory,content_code,content_syntax". Nothing is cached by default.
+RESPONSE_CACHE_AGENTS = os.getenv("RESPONSE_CACHE_AGENTS", "")
+# Cosine similarity needed for a semantic hit; empty disables semantic lookup
+RESPONSE_CACHE_SIMILARITY = os.getenv("RESPONSE_CACHE_SIMILARITY", "")
+
+
+def normalize_prompt(prompt):
+    return re.sub(r"\s+", " ", prompt).strip(" .!?").lower()
+
+
+class ResponseCache:
+    """Agent reply cache with exact and optional embedding-similarity lookup.
+
+    Entries are scoped per agent name, evicted LRU beyond ``max_entries`` and
+    expire after ``ttl`` seconds. Only agents listed in ``agents`` are cached.
+    """
+
+    def __init__(self, agents, max_entries, ttl, similarity=None, embeddings=None):
+        self.agents = set(agents)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self.embeddings = embeddings
+        self._entries = OrderedDict()  # (agent, prompt) -> (reply, vector, stored_at)
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+    def enabled(self, agent_name):
+        return agent_name in self.agents
+
+    async def get(self, agent_name, prompt):
+        key = (agent_name, normalize_prompt(prompt))
+        entry = self._entries.get(key)
+        if entry is not None and not self._expired(entry):
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return entry[0]
+        if entry is not None:
+            del self._entries[key]
+
+        if self.similarity:
+            reply = await self._semantic_get(agent_name, key[1])
+            if reply is not None:
+                self.semantic_hits += 1
+                return reply
+
+        self.misses += 1
+        return None
+
+    async def put(self, agent_name, prompt, reply):
+        key = (agent_name, normalize_prompt(prompt))
+        vector = await self._embed(key[1]) if self.similarity else None
+        self._entries[key] = (reply, vector, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "agents": sorted(self.agents),
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+        }
+
+    def _expired(self, entry):
+        return self.ttl and time.monotonic() - entry[2] > self.ttl
+
+    async def _embed(self, text):
+        vector = np.asarray(await asyncio.to_thread(self.embeddings.embed_query, text), dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    async def _semantic_get(self, agent_name, normalized):
+        candidates = [
+            (key, entry) for key, entry in self._entries.items()
+            if key[0] == agent_name and entry[1] is not None and not self._expired(entry)
+        ]
+        if not candidates:
+            return None
+        query = await self._embed(normalized)
+        scores = np.stack([entry[1] for _, entry in candidates]) @ query
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity:
+            return None
+        key, entry = candidates[best]
+        # A put() or an expiry during the embedding may have dropped the entry
+        if key in self._entries:
+            self._entries.move_to_end(key)
+        return entry[0]
+
+
+response_cache = ResponseCache(
+    agents=[name.strip() for name in RESPONSE_CACHE_AGENTS.split(",") if name.strip()],
+    max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+    ttl=RESPONSE_CACHE_TTL,
+    similarity=float(RESPONSE_CACHE_SIMILARITY) if RESPONSE_CACHE_SIMILARITY else None,
+    embeddings=embeddings,
+)
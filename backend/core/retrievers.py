@@ -0,0 +1,137 @@
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+
+from core.indexes import index_store
+
+logger = logging.getLogger(__name__)
+
+RETRIEVER_IDLE_TTL = int(os.getenv("RETRIEVER_IDLE_TTL", str(60 * 60)))
+RETRIEVER_MAX_ENTRIES = int(os.getenv("RETRIEVER_MAX_ENTRIES", "256"))
+RETRIEVER_MAX_MB = int(os.getenv("RETRIEVER_MAX_MB", "1024"))
+
+
+class RetrieverRegistry:
+    """Per-learner retrievers keyed by an opaque ID.
+
+    Entries idle for longer than ``idle_ttl`` are dropped, and the least
+    recently used ones go first when the entry or memory budget is exceeded.
+    ``on_acquire`` and ``on_release`` are called for each vector store a
+    registered retriever starts and stops searching.
+    """
+
+    def __init__(self, idle_ttl, max_entries, max_bytes, on_acquire=None, on_release=None):
+        self.idle_ttl = idle_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.on_acquire = on_acquire
+        self.on_release = on_release
+        self._entries = OrderedDict()  # id -> [retriever, size, last_used, held vector stores]
+        self._bytes = 0
+        self.created = 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def register(self, retriever, size):
+        self._sweep()
+        retriever_id = uuid.uuid4().hex
+        self._entries[retriever_id] = [retriever, size, time.monotonic(), []]
+        self._hold(retriever_id)
+        self._bytes += size
+        self.created += 1
+        self._enforce_budget()
+        return retriever_id
+
+    def resize(self, retriever_id, size):
+        """Update the accounted size and held stores of a retriever whose sources changed."""
+        entry = self._entries.get(retriever_id)
+        if entry is None:
+            return
+        self._hold(retriever_id)
+        self._bytes += size - entry[1]
+        entry[1] = size
+        self._entries.move_to_end(retriever_id)
+        self._enforce_budget()
+
+    def get(self, retriever_id):
+        self._sweep()
+        entry = self._entries.get(retriever_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        entry[2] = time.monotonic()
+        self._entries.move_to_end(retriever_id)
+        self.hits += 1
+        return entry[0]
+
+    def remove(self, retriever_id):
+        if retriever_id in self._entries:
+            self._remove(retriever_id)
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "created": self.created,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
+
+    def _enforce_budget(self):
+        # The most recently used entry is kept even if it alone is over budget
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            self._remove(next(iter(self._entries)))
+            self.evicted += 1
+
+    def _sweep(self):
+        # Entries are kept in last-used order, so stop at the first fresh one
+        now = time.monotonic()
+        while self._entries:
+            retriever_id, (_, _, last_used, _) = next(iter(self._entries.items()))
+            if now - last_used <= self.idle_ttl:
+                break
+            self._remove(retriever_id)
+            self.expired += 1
+
+    def _hold(self, retriever_id):
+        # Acquire stores the retriever gained before releasing those it dropped
+        entry = self._entries[retriever_id]
+        current, held = entry[0].vectorstores, entry[3]
+        for vectorstore in current:
+            if not any(vectorstore is other for other in held) and self.on_acquire is not None:
+                self.on_acquire(vectorstore)
+        entry[3] = list(current)
+        self._release(retriever_id, [v for v in held if not any(v is other for other in current)])
+
+    def _remove(self, retriever_id):
+        _, size, _, held = self._entries.pop(retriever_id)
+        self._bytes -= size
+        self._release(retriever_id, held)
+
+    def _release(self, retriever_id, vectorstores):
+        if self.on_release is None:
+            return
+        for vectorstore in vectorstores:
+            try:
+                self.on_release(vectorstore)
+            except Exception:
+                logger.exception("Error releasing a vector store of retriever %s", retriever_id)
+
+
+retriever_registry = RetrieverRegistry(
+    idle_ttl=RETRIEVER_IDLE_TTL,
+    max_entries=RETRIEVER_MAX_ENTRIES,
+    max_bytes=RETRIEVER_MAX_MB * 1024 * 1024,
+    on_acquire=index_store.acquire,
+    on_release=index_store.release,
+)
@@ -0,0 +1,56 @@
+from fastapi import HTTPException
+
+from core.pagination import decode_key, encode_key
+
+# Text search configuration of the queries; the generated ``search`` columns
+# use "english" too, see the full_text_search migration in frontend/prisma
+SEARCH_LANGUAGE = "english"
+
+# Searchable document type -> (table, title column)
+SEARCH_SOURCES = {
+    "content": ("Content", "title"),
+    "topic": ("Topic", '"promptName"'),
+    "mentor_log": ("MentorLog", "title"),
+}
+
+
+def _source_query(kind):
+    table, title = SEARCH_SOURCES[kind]
+    select = (
+        f"SELECT '{kind}' AS type, d.id, d.{title} AS title, d.\"createdAt\", "
+        f"ts_rank_cd(d.search, q.query) AS rank FROM \"{table}\" d"
+    )
+    if kind == "mentor_log":
+        # Mentor logs are as visible as the content they were asked about
+        return f'{select} JOIN "Content" c ON c.id = d."contentId", q WHERE c.public AND d.search @@ q.query'
+    return f"{select}, q WHERE d.public AND d.search @@ q.query"
+
+
+async def search(db, text, kinds, limit, cursor=None):
+    """Public documents of ``kinds`` matching ``text``, best match first.
+
+    ``text`` uses web search syntax: quoted phrases, ``or`` and ``-word``.
+    Results page by ``(rank, id)`` so pages stay consistent while paging.
+    """
+    params = [SEARCH_LANGUAGE, text]
+    conditions = ["true"]
+    if cursor:
+        rank, id_ = decode_key(cursor, 2)
+        if not isinstance(rank, (int, float)):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        params += [rank, str(id_)]
+        conditions.append(f"(rank, id) < (${len(params) - 1}::real, ${len(params)})")
+    params.append(limit + 1)
+    sql = (
+        "WITH q AS (SELECT websearch_to_tsquery($1::regconfig, $2) AS query) "
+        f"SELECT * FROM ({' UNION ALL '.join(_source_query(kind) for kind in kinds)}) hits "
+        f"WHERE {' AND '.join(conditions)} "
+        f"ORDER BY rank DESC, id DESC LIMIT ${len(params)}"
+    )
+    rows = await db.query_raw(sql, *params)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "items": rows,
+        "nextCursor": encode_key(rows[-1]["rank"], rows[-1]["id"]) if has_more else None,
+    }
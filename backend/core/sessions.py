@@ -0,0 +1,254 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+# "memory" keeps sessions in this process only, "sqlite" persists them
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+SESSION_DB_PATH = os.getenv(
+    "SESSION_DB_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "sessions.sqlite3"),
+)
+SESSION_IDLE_TTL = int(os.getenv("SESSION_IDLE_TTL", str(24 * 60 * 60)))
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "512"))
+
+_MESSAGE_TYPES = {"ai": AIMessage, "human": HumanMessage, "system": SystemMessage}
+
+
+def to_message(role, content):
+    return _MESSAGE_TYPES.get(role, HumanMessage)(content=content)
+
+
+def message_role(msg):
+    return "ai" if isinstance(msg, AIMessage) else "system" if isinstance(msg, SystemMessage) else "human"
+
+
+class MemorySessionBackend:
+    """Sessions held in a dict, lost on restart."""
+
+    def __init__(self):
+        self._sessions = {}  # id -> [messages, updated_at]
+
+    def create(self, session_id):
+        self._sessions[session_id] = [[], time.time()]
+
+    def load(self, session_id, after):
+        entry = self._sessions.get(session_id)
+        if entry is None or entry[1] < after:
+            return None
+        return list(entry[0]), entry[1]
+
+    def append(self, session_id, rows, after):
+        entry = self._sessions.get(session_id)
+        if entry is None or entry[1] < after:
+            return False
+        entry[0].extend(rows)
+        entry[1] = time.time()
+        return True
+
+    def delete(self, session_id):
+        return self._sessions.pop(session_id, None) is not None
+
+    def expire(self, before):
+        expired = [sid for sid, (_, updated_at) in self._sessions.items() if updated_at < before]
+        for session_id in expired:
+            del self._sessions[session_id]
+        return expired
+
+
+class SqliteSessionBackend:
+    """Sessions persisted in SQLite, one row per message so turns are appended."""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, updated_at REAL NOT NULL)"
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS session_messages (
+                    session_id TEXT NOT NULL,
+                    seq        INTEGER NOT NULL,
+                    role       TEXT NOT NULL,
+                    content    TEXT NOT NULL,
+                    PRIMARY KEY (session_id, seq)
+                )
+                """
+            )
+
+    def _connect(self):
+        # One connection per thread, calls arrive on worker threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def create(self, session_id):
+        with self._connect() as conn:
+            conn.execute("INSERT INTO sessions VALUES (?, ?)", (session_id, time.time()))
+
+    def load(self, session_id, after):
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT updated_at FROM sessions WHERE id = ? AND updated_at >= ?", (session_id, after)
+        ).fetchone()
+        if row is None:
+            return None
+        return conn.execute(
+            "SELECT role, content FROM session_messages WHERE session_id = ? ORDER BY seq",
+            (session_id,),
+        ).fetchall(), row[0]
+
+    def append(self, session_id, rows, after):
+        with self._connect() as conn:
+            updated = conn.execute(
+                "UPDATE sessions SET updated_at = ? WHERE id = ? AND updated_at >= ?",
+                (time.time(), session_id, after),
+            ).rowcount
+            if not updated:
+                return False
+            (seq,) = conn.execute(
+                "SELECT COALESCE(MAX(seq), -1) FROM session_messages WHERE session_id = ?",
+                (session_id,),
+            ).fetchone()
+            conn.executemany(
+                "INSERT INTO session_messages VALUES (?, ?, ?, ?)",
+                [(session_id, seq + 1 + i, role, content) for i, (role, content) in enumerate(rows)],
+            )
+        return True
+
+    def delete(self, session_id):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM session_messages WHERE session_id = ?", (session_id,))
+            return conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,)).rowcount > 0
+
+    def expire(self, before):
+        with self._connect() as conn:
+            expired = [row[0] for row in conn.execute("SELECT id FROM sessions WHERE updated_at < ?", (before,))]
+            conn.executemany("DELETE FROM session_messages WHERE session_id = ?", [(sid,) for sid in expired])
+            conn.executemany("DELETE FROM sessions WHERE id = ?", [(sid,) for sid in expired])
+        return expired
+
+
+class SessionStore:
+    """Tutoring chat histories keyed by session ID.
+
+    Parsed histories of recently used sessions stay in an LRU cache in front
+    of the backend, so a turn only reads the backend on a cache miss and only
+    writes the new messages. Sessions idle for ``idle_ttl`` seconds expire:
+    reads and writes refuse them straight away, and a periodic sweep removes
+    them from the backend.
+    """
+
+    def __init__(self, backend, cache_size, idle_ttl):
+        self.backend = backend
+        self.cache_size = cache_size
+        self.idle_ttl = idle_ttl
+        self._cache = OrderedDict()  # id -> [messages, updated_at]
+        self._last_sweep = time.monotonic()
+        self.created = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.expired = 0
+
+    async def create(self):
+        await self._sweep()
+        session_id = uuid.uuid4().hex
+        await asyncio.to_thread(self.backend.create, session_id)
+        self._remember(session_id, [], time.time())
+        self.created += 1
+        return session_id
+
+    async def history(self, session_id):
+        """Messages of the session, or None if it does not exist or has expired."""
+        await self._sweep()
+        entry = self._cached(session_id)
+        if entry is not None:
+            self.cache_hits += 1
+            return list(entry[0])
+        self.cache_misses += 1
+        loaded = await asyncio.to_thread(self.backend.load, session_id, self._idle_since())
+        if loaded is None:
+            return None
+        rows, updated_at = loaded
+        messages = [to_message(role, content) for role, content in rows]
+        self._remember(session_id, messages, updated_at)
+        return list(messages)
+
+    async def append(self, session_id, messages):
+        await self._sweep()
+        rows = [(message_role(msg), msg.content) for msg in messages]
+        # The backend checks idle time too, for sessions not in the cache
+        if not await asyncio.to_thread(self.backend.append, session_id, rows, self._idle_since()):
+            self._cache.pop(session_id, None)
+            return False
+        entry = self._cached(session_id)
+        if entry is not None:
+            entry[0].extend(messages)
+            entry[1] = time.time()
+        return True
+
+    async def delete(self, session_id):
+        self._cache.pop(session_id, None)
+        return await asyncio.to_thread(self.backend.delete, session_id)
+
+    def stats(self):
+        return {
+            "backend": type(self.backend).__name__,
+            "cached": len(self._cache),
+            "created": self.created,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "expired": self.expired,
+        }
+
+    def _idle_since(self):
+        return time.time() - self.idle_ttl
+
+    def _cached(self, session_id):
+        entry = self._cache.get(session_id)
+        if entry is None:
+            return None
+        if entry[1] < self._idle_since():
+            # Expired between sweeps, the backend refuses it as well
+            del self._cache[session_id]
+            return None
+        self._cache.move_to_end(session_id)
+        return entry
+
+    def _remember(self, session_id, messages, updated_at):
+        self._cache[session_id] = [messages, updated_at]
+        self._cache.move_to_end(session_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def _sweep(self):
+        # Expiry scans the backend, so run it at most once a minute
+        if time.monotonic() - self._last_sweep < 60:
+            return
+        self._last_sweep = time.monotonic()
+        expired = await asyncio.to_thread(self.backend.expire, time.time() - self.idle_ttl)
+        for session_id in expired:
+            self._cache.pop(session_id, None)
+        self.expired += len(expired)
+
+
+def _backend():
+    if SESSION_BACKEND == "sqlite":
+        return SqliteSessionBackend(SESSION_DB_PATH)
+    if SESSION_BACKEND == "memory":
+        return MemorySessionBackend()
+    raise ValueError(f"SESSION_BACKEND must be memory or sqlite, got {SESSION_BACKEND!r}")
+
+
+session_store = SessionStore(_backend(), cache_size=SESSION_CACHE_SIZE, idle_ttl=SESSION_IDLE_TTL)
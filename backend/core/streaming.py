@@ -0,0 +1,41 @@
+import json
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+
+from core.agents import stream_agent
+
+
+def sse_event(data, event=None):
+    """Format one Server-Sent Event with a JSON payload."""
+    message = f"data: {json.dumps(jsonable_encoder(data))}\n\n"
+    if event:
+        message = f"event: {event}\n" + message
+    return message
+
+
+def sse_response(events, background=None):
+    """Wrap an async generator of ``sse_event`` strings in a streaming response."""
+
+    async def guarded():
+        try:
+            async for message in events:
+                yield message
+        except Exception as e:
+            yield sse_event({"detail": str(e)}, event="error")
+
+    return StreamingResponse(
+        guarded(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=background,
+    )
+
+
+async def agent_events(agent, messages):
+    """SSE ``token`` events for each delta, then a ``done`` event with the reply."""
+    async for item in stream_agent(agent, messages):
+        if isinstance(item, str):
+            yield sse_event({"content": item}, event="token")
+        else:
+            yield sse_event({"response": item.messages[-1]["content"]}, event="done")
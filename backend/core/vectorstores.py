@@ -0,0 +1,197 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+
+from core.indexes import index_store
+from core.jobs import job_queue, JobQueueFull
+
+logger = logging.getLogger(__name__)
+
+VECTOR_CACHE_MAX_ENTRIES = int(os.getenv("VECTOR_CACHE_MAX_ENTRIES", "32"))
+VECTOR_CACHE_MAX_MB = int(os.getenv("VECTOR_CACHE_MAX_MB", "512"))
+VECTOR_CACHE_TTL = int(os.getenv("VECTOR_CACHE_TTL", str(6 * 60 * 60)))
+# Seconds before a web index is conditionally re-fetched, 0 disables
+INDEX_REVALIDATE_AFTER = int(os.getenv("INDEX_REVALIDATE_AFTER", str(24 * 60 * 60)))
+
+
+class VectorStoreCache:
+    """Bounded LRU + TTL cache of vector stores with single-flight loading.
+
+    ``loader(key)`` is a blocking callable returning ``(value, size_bytes)``,
+    or None when there is nothing to load, which is not cached. It runs in a
+    worker thread and concurrent requests for the same key share one load.
+    ``on_store`` and ``on_evict`` are called with each value entering and
+    leaving the cache.
+    """
+
+    def __init__(self, max_entries, max_bytes, ttl, on_store=None, on_evict=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.on_store = on_store
+        self.on_evict = on_evict
+        self._entries = OrderedDict()  # key -> (value, size, loaded_at)
+        self._loading = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.load_errors = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, _, loaded_at = entry
+        if self.ttl and time.monotonic() - loaded_at > self.ttl:
+            self._evict(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value, size):
+        # Stored before the old entry is evicted, so replacing an entry with
+        # the same collection never unloads it
+        if self.on_store is not None:
+            self.on_store(value)
+        if key in self._entries:
+            self._evict(key)
+        self._entries[key] = (value, size, time.monotonic())
+        self._bytes += size
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            oldest = next(iter(self._entries))
+            if oldest == key and len(self._entries) == 1:
+                break  # a single oversized entry is still served
+            self._evict(oldest)
+
+    def is_loading(self, key):
+        return key in self._loading
+
+    async def get_or_load(self, key, loader):
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        if key in self._loading:
+            self.coalesced += 1
+            return await asyncio.shield(self._loading[key])
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        try:
+            loaded = await asyncio.to_thread(loader, key)
+            if loaded is None:
+                future.set_result(None)
+                return None
+            value, size = loaded
+            self.put(key, value, size)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            self.load_errors += 1
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else is waiting
+            raise
+        finally:
+            del self._loading[key]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "load_errors": self.load_errors,
+            "loading": len(self._loading),
+        }
+
+    def _evict(self, key):
+        value, size, _ = self._entries.pop(key)
+        self._bytes -= size
+        self.evictions += 1
+        if self.on_evict is not None:
+            try:
+                self.on_evict(value)
+            except Exception:
+                logger.exception("Error releasing evicted vector store %s", key)
+
+
+async def get_ready_vectorstore(url):
+    """Vector store for ``url`` if it is already indexed, without fetching it."""
+    if vector_store_cache.is_loading(url):
+        # Do not hold the request open behind an indexing job
+        return None
+    vector_store = await vector_store_cache.get_or_load(url, index_store.open)
+    if vector_store is not None and INDEX_REVALIDATE_AFTER:
+        await _schedule_revalidation(url)
+    return vector_store
+
+
+_next_revalidation = {}  # url -> time.time() after which it is re-checked
+
+
+async def _schedule_revalidation(url):
+    # The stale index keeps being served while the refresh runs
+    if url not in _next_revalidation:
+        checked_at = await asyncio.to_thread(index_store.checked_at, url)
+        _next_revalidation[url] = (checked_at or 0.0) + INDEX_REVALIDATE_AFTER
+    if time.time() < _next_revalidation[url]:
+        return
+    try:
+        submit_revalidation(url)
+        _next_revalidation[url] = time.time() + INDEX_REVALIDATE_AFTER
+    except JobQueueFull:
+        logger.warning("Job queue full, revalidation of %s postponed", url)
+
+
+def submit_revalidation(url):
+    """Queue a conditional re-fetch of ``url`` that re-embeds only changed chunks."""
+    async def revalidate_url(job):
+        vector_store, size, changed = await asyncio.to_thread(index_store.revalidate, url, "default", job.advance)
+        if changed or vector_store_cache.get(url) is None:
+            vector_store_cache.put(url, vector_store, size)
+        return {"url": url, "changed": changed}
+
+    return job_queue.submit("revalidate_url", revalidate_url, key=("revalidate_url", url))
+
+
+def submit_url_indexing(url):
+    """Queue fetching and indexing ``url`` into the vector store cache."""
+    async def index_url(job):
+        vector_store = None
+        # A concurrent get_ready_vectorstore may be sharing the load and find nothing
+        while vector_store is None:
+            vector_store = await vector_store_cache.get_or_load(
+                url, lambda key: index_store.load(key, progress=job.advance)
+            )
+        return {"url": url}
+
+    return job_queue.submit("index_url", index_url, key=("index_url", url))
+
+
+# Shared by the topics, contents and quiz routers. Collections no longer held
+# by this cache or a retriever are unloaded from Chroma, so the byte budgets
+# bound real memory use.
+vector_store_cache = VectorStoreCache(
+    max_entries=VECTOR_CACHE_MAX_ENTRIES,
+    max_bytes=VECTOR_CACHE_MAX_MB * 1024 * 1024,
+    ttl=VECTOR_CACHE_TTL,
+    on_store=index_store.acquire,
+    on_evict=index_store.release,
+)
@@ -1,17 +1,56 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from core.db import connect_db, disconnect_db, check_db_health, monitor_db, DB_HEALTH_INTERVAL
+from core.agents import shutdown_agents
+from core.vectorstores import vector_store_cache
+from core.indexes import index_store
+from core.embeddings import embeddings
+from core.retrievers import retriever_registry
+from core.response_cache import response_cache
+from core.rag import rewrite_stats
+from core.history import history_manager
+from core.sessions import session_store
+from core.jobs import job_queue, curriculum_queue
+from core.read_cache import read_cache
+from core.content_index import content_index
 from routers.users import router as user_router
 from routers.contents import router as content_router
 from routers.topics import router as topic_router
 from routers.mentorlogs import router as mentor_log_router
 from routers.quiz import router as quiz_router 
 from routers.contentai import router as newcontent_router 
-from routers.practiceai import router as practiceai_router 
+from routers.practiceai import router as practiceai_router, live_tracking
+from routers.jobs import router as jobs_router
+from routers.search import router as search_router
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled Prisma client for the whole process
+    await connect_db()
+    monitor = asyncio.create_task(monitor_db()) if DB_HEALTH_INTERVAL else None
+    content_index.start()
+    try:
+        yield
+    finally:
+        if monitor is not None:
+            monitor.cancel()
+            await asyncio.gather(monitor, return_exceptions=True)
+        await content_index.stop()
+        await job_queue.shutdown()
+        await curriculum_queue.shutdown()
+        await disconnect_db()
+        shutdown_agents()
+
 
 app = FastAPI(
     title="CodeMentor API",
     description="Backend API for CodeMentor application",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -21,6 +60,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Failed-Sections", "X-Next-Cursor", "X-Reused-From"],
 )
 
 # Include routers
@@ -31,6 +71,34 @@ app.include_router(mentor_log_router)
 app.include_router(quiz_router)
 app.include_router(newcontent_router)
 app.include_router(practiceai_router)
+app.include_router(jobs_router)
+app.include_router(search_router)
+
+
+@app.get("/health")
+async def health():
+    if not await check_db_health():
+        raise HTTPException(status_code=503, detail="Database unavailable")
+    return {"status": "ok"}
+
+
+@app.get("/metrics")
+async def metrics():
+    return {
+        "vector_store_cache": vector_store_cache.stats(),
+        "indexes": index_store.stats(),
+        "embedding_cache": embeddings.stats(),
+        "retrievers": retriever_registry.stats(),
+        "response_cache": response_cache.stats(),
+        "retrieval_rewrites": rewrite_stats.stats(),
+        "chat_history": history_manager.stats(),
+        "sessions": session_store.stats(),
+        "jobs": job_queue.stats(),
+        "curriculum_jobs": curriculum_queue.stats(),
+        "read_cache": read_cache.stats(),
+        "content_reuse": content_index.stats(),
+        "live_tracking": live_tracking.stats(),
+    }
 
 
 if __name__ == "__main__":
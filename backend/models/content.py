@@ -8,4 +8,12 @@ class CreateContentDto(BaseModel):
     contentCodes: Optional[str] = None
     contentSyntax: Optional[str] = None
     public: Optional[bool] = False
-    userId: str
\ No newline at end of file
+    userId: str
+    # Copy the sections of a near-identical public content instead of generating
+    reuse: Optional[bool] = True
+
+class CreateCurriculumDto(BaseModel):
+    topicId: str
+    userId: str
+    public: Optional[bool] = False
+    reuse: Optional[bool] = True
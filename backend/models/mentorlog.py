@@ -7,4 +7,6 @@ class CreateMentorLogDto(BaseModel):
     question: str
     response: Optional[str] = None
     userId: str
-    contentId: str
\ No newline at end of file
+    contentId: str
+    # "llm", "local" or "deferred"; defaults to MENTOR_TITLE_MODE
+    titleMode: Optional[str] = None
\ No newline at end of file
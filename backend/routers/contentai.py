@@ -1,241 +1,321 @@
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
-from langchain_openai import ChatOpenAI
-from langchain_chroma import Chroma
-from langchain_openai import OpenAIEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_community.document_loaders import WebBaseLoader, PyPDFLoader
-from langchain.chains import create_history_aware_retriever, create_retrieval_chain
-from langchain.chains.combine_documents import create_stuff_documents_chain
+from typing import Optional
 from langchain_core.messages import AIMessage, HumanMessage
 import os
 
 from fastapi import APIRouter, HTTPException
-
-# Initialize variables
-global retriever
-retriever = None
+from core.indexes import index_store, MultiSourceRetriever
+from core.retrievers import retriever_registry
+import asyncio
+from core.agents import iterate_in_executor
+from core.streaming import sse_event, sse_response
+from core.rag import get_rag_chain, RagVariant
+from core.history import history_manager
+from core.sessions import session_store
+from core.jobs import job_queue, accepted, JobQueueFull
 
 router = APIRouter(prefix="/newcontent", tags=["newcontent"])
 
 
 
-llm = ChatOpenAI(model="gpt-4o")
-text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+TUTORING = RagVariant(
+    name="tutoring",
+    system_prompt="Teach the user on the certain topic based on the context. Also give him a question after each response. If the user is correct move ahead.:\n\n{context}",
+    rewrite_prompt="Based on the conversation, generate a search query to get relevant information.",
+    model="gpt-4o",
+)
 
 # Request Models
 class SourceInput(BaseModel):
     sources: list[str]
 
 class ChatInput(BaseModel):
+    retriever_id: str
     prompt: str
     topic: str 
-    chat_history: list[dict]
+    # Either a session_id from /session or the full chat_history
+    session_id: Optional[str] = None
+    chat_history: list[dict] = []
 
 class TopicInput(BaseModel):
+    retriever_id: str
     specific_section: str 
-    chat_history: list[dict]
+    # Either a session_id from /session or the full chat_history
+    session_id: Optional[str] = None
+    chat_history: list[dict] = []
 
 class QuizBody(BaseModel):
-    chat_history: list[dict]
+    retriever_id: str
+    # Either a session_id from /session or the full chat_history
+    session_id: Optional[str] = None
+    chat_history: list[dict] = []
 
 class QuizResult(BaseModel):
+    retriever_id: str
     wrong_text: str
-    chat_history: list[dict]
+    # Either a session_id from /session or the full chat_history
+    session_id: Optional[str] = None
+    chat_history: list[dict] = []
 
 
 class RetakeBody(BaseModel):
-    chat_history: list[dict]
+    retriever_id: str
+    # Either a session_id from /session or the full chat_history
+    session_id: Optional[str] = None
+    chat_history: list[dict] = []
 
 # Helper Functions
-def process_documents(sources):
-    documents = []
-    for source in sources:
-        if source.endswith(".pdf"):
-            loader = PyPDFLoader(source)
-        else:
-            loader = WebBaseLoader(source)
-        documents.extend(loader.load())
-
-    document_chunks = text_splitter.split_documents(documents)
-    vectorstore = Chroma.from_documents(document_chunks, OpenAIEmbeddings())
-    return vectorstore.as_retriever()
-
-def get_conversational_rag_chain(retriever):
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", "Teach the user on the certain topic based on the context. Also give him a question after each response. If the user is correct move ahead.:\n\n{context}"),
-        MessagesPlaceholder(variable_name="chat_history"),
-        ("user", "{input}"),
-    ])
-    stuff_documents_chain = create_stuff_documents_chain(llm, prompt)
-    return create_retrieval_chain(retriever, stuff_documents_chain)
-
-def get_context_retriever_chain(retriever):
-    prompt = ChatPromptTemplate.from_messages([
-        MessagesPlaceholder(variable_name="chat_history"),
-        ("user", "{input}"),
-        ("user", "Based on the conversation, generate a search query to get relevant information."),
-    ])
-    return create_history_aware_retriever(llm, retriever, prompt)
+def process_documents(sources, progress=None):
+    # One persisted collection per source, reopened from disk when possible
+    sources = list(dict.fromkeys(sources))
+    loaded = index_store.load_many(sources, profile="tutoring", progress=progress)
+    retriever = MultiSourceRetriever(vectorstores=[], sources=[], sizes=[])
+    retriever.add_loaded(sources, loaded)
+    return retriever, retriever.size
+
+def get_retriever(retriever_id):
+    retriever = retriever_registry.get(retriever_id)
+    if retriever is None:
+        raise HTTPException(status_code=404, detail="Retriever not found or expired. Please load sources first.")
+    return retriever
+
+def chat_instruction(topic, prompt):
+    return f"Your task is to teach the user the topic {topic}. The conversation so far is in the chat history above. If the chat history covers concept, programming and example, then the user learnt everything for now. Tell that he learnt the topic. If not.   Teach him slowly. Also after explaining something, ask him 2 or 3 question with multiple choice. Each question will be formatted by ((question?*a) *b) *c) *d))). Analysis the chat history provided to check if the user is answering correct or not. If he answers correct, explain further on the topic. After explaining the concept, move on to code part. and show some example codes. Then ask for output of the code. Later at the end of your chat stream, tell the user to point out error in a code in MCQ. Finally when y think the user has learnt it everything, show a ending message. The user says: {prompt}"
+
+def load_history(raw_history):
+    return [
+        AIMessage(content=msg["content"]) if msg["role"] == "ai" else HumanMessage(content=msg["content"])
+        for msg in raw_history
+    ]
+
+async def fit_history(input):
+    """History for this turn and its token-budgeted version for the model.
+
+    Read from the session store when the request has a ``session_id``,
+    otherwise parsed from the ``chat_history`` the client sent.
+    """
+    if input.session_id:
+        chat_history = await session_store.history(input.session_id)
+        if chat_history is None:
+            raise HTTPException(status_code=404, detail="Session not found or expired. Please start a new session.")
+    else:
+        chat_history = load_history(input.chat_history)
+    model_history, tokens_saved = await history_manager.fit(chat_history, TUTORING.model)
+    return chat_history, model_history, tokens_saved
+
+async def finish_turn(input, chat_history, new_turn, answer, tokens_saved):
+    """Session requests get only the new turn back, others the whole history."""
+    if input.session_id:
+        if not await session_store.append(input.session_id, new_turn):
+            raise HTTPException(status_code=404, detail="Session not found or expired. Please start a new session.")
+        return {
+            "response": answer,
+            "session_id": input.session_id,
+            "turn": dump_history(new_turn),
+            "tokens_saved": tokens_saved,
+        }
+    return {
+        "response": answer,
+        "chat_history": dump_history(chat_history + new_turn),
+        "tokens_saved": tokens_saved,
+    }
+
+def dump_history(chat_history):
+    return [
+        {"role": "ai" if isinstance(msg, AIMessage) else "human", "content": msg.content}
+        for msg in chat_history
+    ]
 
 # API Endpoints
 @router.post("/load_sources")
 async def load_sources(input: SourceInput):
-    global retriever
+    """Queue indexing the sources; the job result holds the retriever_id."""
+    async def load(job):
+        job.advance("sources_total", len(input.sources))
+        retriever, size = await asyncio.to_thread(process_documents, input.sources, job.advance)
+        return {"retriever_id": retriever_registry.register(retriever, size)}
+
     try:
-        retriever = process_documents(input.sources)
-        return {"message": "Sources processed and retriever initialized successfully."}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing sources: {str(e)}")
+        job = job_queue.submit("load_sources", load)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Too many indexing jobs waiting: {str(e)}")
+    return accepted(job, "Processing sources. Poll the job for the retriever_id.")
+
+@router.delete("/retriever/{retriever_id}")
+async def release_retriever(retriever_id: str):
+    retriever_registry.remove(retriever_id)
+    return {"message": "Retriever released."}
+
+@router.post("/retriever/{retriever_id}/sources")
+async def add_sources(retriever_id: str, input: SourceInput):
+    """Queue loading only the sources the retriever does not have yet."""
+    retriever = get_retriever(retriever_id)
+
+    async def add(job):
+        new = [source for source in dict.fromkeys(input.sources) if source not in retriever.sources]
+        job.advance("sources_total", len(new))
+        loaded = await asyncio.to_thread(index_store.load_many, new, "tutoring", job.advance)
+        added = retriever.add_loaded(new, loaded)
+        retriever_registry.resize(retriever_id, retriever.size)
+        return {"retriever_id": retriever_id, "added": added, "sources": retriever.sources}
+
+    try:
+        job = job_queue.submit("add_sources", add)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Too many indexing jobs waiting: {str(e)}")
+    return accepted(job, "Adding sources. Poll the job for the updated source list.")
+
+@router.delete("/retriever/{retriever_id}/sources")
+async def remove_source(retriever_id: str, source: str):
+    retriever = get_retriever(retriever_id)
+    if source not in retriever.sources:
+        raise HTTPException(status_code=404, detail="Source is not part of this retriever.")
+    retriever.remove_source(source)
+    retriever_registry.resize(retriever_id, retriever.size)
+    return {"retriever_id": retriever_id, "sources": retriever.sources}
+
+@router.post("/session")
+async def create_session():
+    return {"session_id": await session_store.create()}
+
+@router.get("/session/{session_id}")
+async def get_session(session_id: str):
+    chat_history = await session_store.history(session_id)
+    if chat_history is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired. Please start a new session.")
+    return {"session_id": session_id, "chat_history": dump_history(chat_history)}
+
+@router.delete("/session/{session_id}")
+async def delete_session(session_id: str):
+    if not await session_store.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found or expired.")
+    return {"message": "Session deleted."}
 
 @router.post("/chat")
 async def chat(input: ChatInput):
-    global retriever
-    if retriever is None:
-        raise HTTPException(status_code=400, detail="Retriever not initialized. Please load sources first.")
+    retriever = get_retriever(input.retriever_id)
 
     try:
         # Reconstruct chat history
-        chat_history = [
-            AIMessage(content=msg["content"]) if msg["role"] == "ai" else HumanMessage(content=msg["content"])
-            for msg in input.chat_history
-        ]
+        chat_history, model_history, tokens_saved = await fit_history(input)
 
         # Generate response
-        retriever_chain = get_context_retriever_chain(retriever)
-        conversation_rag_chain = get_conversational_rag_chain(retriever_chain)
-        response = conversation_rag_chain.invoke({
-            "chat_history": chat_history,
-            "input": f"Your task is to teach the user the topic {input.topic}. This is the {chat_history}. If the chat history covers concept, programming and example, then the user learnt everything for now. Tell that he learnt the topic. If not.   Teach him slowly. Also after explaining something, ask him 2 or 3 question with multiple choice. Each question will be formatted by ((question?*a) *b) *c) *d))). Analysis the chat history provided to check if the user is answering correct or not. If he answers correct, explain further on the topic. After explaining the concept, move on to code part. and show some example codes. Then ask for output of the code. Later at the end of your chat stream, tell the user to point out error in a code in MCQ. Finally when y think the user has learnt it everything, show a ending message.",
+        conversation_rag_chain = get_rag_chain(retriever, TUTORING, "newcontent_chat")
+        response = await conversation_rag_chain.ainvoke({
+            "chat_history": model_history,
+            "input": chat_instruction(input.topic, input.prompt),
         })
 
-        # Update chat history
-        chat_history.append(HumanMessage(content=input.prompt))
-        chat_history.append(AIMessage(content=response["answer"]))
-
-        # Return updated history and response
-        return {
-            "response": response["answer"],
-            "chat_history": [
-                {"role": "ai" if isinstance(msg, AIMessage) else "human", "content": msg.content}
-                for msg in chat_history
-            ],
-        }
+        # Record the turn and return it with the response
+        new_turn = [HumanMessage(content=input.prompt), AIMessage(content=response["answer"])]
+        return await finish_turn(input, chat_history, new_turn, response["answer"], tokens_saved)
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating response: {str(e)}")
 
 
+@router.post("/chat/stream")
+async def chat_stream(input: ChatInput):
+    retriever = get_retriever(input.retriever_id)
+
+    async def events():
+        chat_history, model_history, tokens_saved = await fit_history(input)
+        conversation_rag_chain = get_rag_chain(retriever, TUTORING, "newcontent_chat")
+        chunks = iterate_in_executor(lambda: conversation_rag_chain.stream({
+            "chat_history": model_history,
+            "input": chat_instruction(input.topic, input.prompt),
+        }))
+
+        answer = ""
+        async for chunk in chunks:
+            if chunk.get("answer"):
+                answer += chunk["answer"]
+                yield sse_event({"content": chunk["answer"]}, event="token")
+
+        new_turn = [HumanMessage(content=input.prompt), AIMessage(content=answer)]
+        yield sse_event(await finish_turn(input, chat_history, new_turn, answer, tokens_saved), event="done")
+
+    return sse_response(events())
+
+
 
 @router.post("/topic_list")
 async def topic(input: TopicInput):
-    global retriever
-    if retriever is None:
-        raise HTTPException(status_code=400, detail="Retriever not initialized. Please load sources first.")
+    retriever = get_retriever(input.retriever_id)
 
     try:
         # Reconstruct chat history
-        chat_history = [
-            AIMessage(content=msg["content"]) if msg["role"] == "ai" else HumanMessage(content=msg["content"])
-            for msg in input.chat_history
-        ]
+        chat_history, model_history, tokens_saved = await fit_history(input)
 
         # Generate response
-        retriever_chain = get_context_retriever_chain(retriever)
-        conversation_rag_chain = get_conversational_rag_chain(retriever_chain)
-        response = conversation_rag_chain.invoke({
-            "chat_history": chat_history,
+        conversation_rag_chain = get_rag_chain(retriever, TUTORING, "newcontent_topic_list")
+        response = await conversation_rag_chain.ainvoke({
+            "chat_history": model_history,
             "input":f"Generate a topic list on the specific part specified or whole section. Use only bulletin points of number. Dont generate other things. Specified Section: {input.specific_section}",
         })
 
-        # Update chat history
-        chat_history.append(AIMessage(content=response["answer"]))
-
-        # Return updated history and response
-        return {
-            "response": response["answer"],
-            "chat_history": [
-                {"role": "ai" if isinstance(msg, AIMessage) else "human", "content": msg.content}
-                for msg in chat_history
-            ],
-        }
+        # Record the turn and return it with the response
+        new_turn = [AIMessage(content=response["answer"])]
+        return await finish_turn(input, chat_history, new_turn, response["answer"], tokens_saved)
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating response: {str(e)}")
 
 
 @router.post("/take_quiz")
 async def quiz(input: QuizBody):
-    global retriever
-    if retriever is None:
-        raise HTTPException(status_code=400, detail="Retriever not initialized. Please load sources first.")
+    retriever = get_retriever(input.retriever_id)
 
     try:
         # Reconstruct chat history
-        chat_history = [
-            AIMessage(content=msg["content"]) if msg["role"] == "ai" else HumanMessage(content=msg["content"])
-            for msg in input.chat_history
-        ]
+        chat_history, model_history, tokens_saved = await fit_history(input)
 
         # Generate response
-        retriever_chain = get_context_retriever_chain(retriever)
-        conversation_rag_chain = get_conversational_rag_chain(retriever_chain)
-        response = conversation_rag_chain.invoke({
-            "chat_history": chat_history,
+        conversation_rag_chain = get_rag_chain(retriever, TUTORING, "newcontent_take_quiz")
+        response = await conversation_rag_chain.ainvoke({
+            "chat_history": model_history,
             "input":f"Generate 15 Multiple Choice Questions based on the chat history and also the context. Moreover, after each question say the answer too. put the answer in /box() with the number inside. so if question 1's answer is A. then /box(1A)",
         })
 
-        # Update chat history
-        chat_history.append(AIMessage(content=response["answer"]))
-
-        # Return updated history and response
-        return {
-            "response": response["answer"],
-            "chat_history": [
-                {"role": "ai" if isinstance(msg, AIMessage) else "human", "content": msg.content}
-                for msg in chat_history
-            ],
-        }
+        # Record the turn and return it with the response
+        new_turn = [AIMessage(content=response["answer"])]
+        return await finish_turn(input, chat_history, new_turn, response["answer"], tokens_saved)
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating response: {str(e)}")
 
 
 @router.post("/evaluate_quiz")
 async def evaluate(input: QuizResult):
-    global retriever
-    if retriever is None:
-        raise HTTPException(status_code=400, detail="Retriever not initialized. Please load sources first.")
+    retriever = get_retriever(input.retriever_id)
 
     try:
         # Reconstruct chat history
-        chat_history = [
-            AIMessage(content=msg["content"]) if msg["role"] == "ai" else HumanMessage(content=msg["content"])
-            for msg in input.chat_history
-        ]
+        chat_history, model_history, tokens_saved = await fit_history(input)
 
         # Generate response
-        retriever_chain = get_context_retriever_chain(retriever)
-        conversation_rag_chain = get_conversational_rag_chain(retriever_chain)
-        response = conversation_rag_chain.invoke({
-            "chat_history": chat_history,
+        conversation_rag_chain = get_rag_chain(retriever, TUTORING, "newcontent_evaluate_quiz")
+        response = await conversation_rag_chain.ainvoke({
+            "chat_history": model_history,
             "input":f"These are the questions i got wrong in the quiz. {input.wrong_text}. Now teach me those questions.",
         })
 
-        # Update chat history
-        chat_history.append(HumanMessage(content=f"(I got these questions wrong. {input.wrong_text})"))
-        chat_history.append(AIMessage(content=response["answer"]))
-
-        # Return updated history and response
-        return {
-            "response": response["answer"],
-            "chat_history": [
-                {"role": "ai" if isinstance(msg, AIMessage) else "human", "content": msg.content}
-                for msg in chat_history
-            ],
-        }
+        # Record the turn and return it with the response
+        new_turn = [
+            HumanMessage(content=f"(I got these questions wrong. {input.wrong_text})"),
+            AIMessage(content=response["answer"]),
+        ]
+        return await finish_turn(input, chat_history, new_turn, response["answer"], tokens_saved)
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating response: {str(e)}")
 
@@ -243,37 +323,25 @@ async def evaluate(input: QuizResult):
 
 @router.post("/retake_quiz")
 async def retake(input: RetakeBody):
-    global retriever
-    if retriever is None:
-        raise HTTPException(status_code=400, detail="Retriever not initialized. Please load sources first.")
+    retriever = get_retriever(input.retriever_id)
 
     try:
         # Reconstruct chat history
-        chat_history = [
-            AIMessage(content=msg["content"]) if msg["role"] == "ai" else HumanMessage(content=msg["content"])
-            for msg in input.chat_history
-        ]
+        chat_history, model_history, tokens_saved = await fit_history(input)
 
         # Generate response
-        retriever_chain = get_context_retriever_chain(retriever)
-        conversation_rag_chain = get_conversational_rag_chain(retriever_chain)
-        response = conversation_rag_chain.invoke({
-            "chat_history": chat_history,
+        conversation_rag_chain = get_rag_chain(retriever, TUTORING, "newcontent_retake_quiz")
+        response = await conversation_rag_chain.ainvoke({
+            "chat_history": model_history,
             "input":f"Generate me a quiz again on 15 questions but these time generate 70% questions on the topic i got wrong. Moreover, after each question say the answer too. put the answer in /box() with the number inside. so if question 1's answer is A. then /box(1A)",
         })
 
-        # Update chat history
-        chat_history.append(AIMessage(content=response["answer"]))
-
-        # Return updated history and response
-        return {
-            "response": response["answer"],
-            "chat_history": [
-                {"role": "ai" if isinstance(msg, AIMessage) else "human", "content": msg.content}
-                for msg in chat_history
-            ],
-        }
+        # Record the turn and return it with the response
+        new_turn = [AIMessage(content=response["answer"])]
+        return await finish_turn(input, chat_history, new_turn, response["answer"], tokens_saved)
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating response: {str(e)}") 
     
@@ -1,28 +1,33 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from prisma import Prisma
-from models.content import CreateContentDto
-from typing import List
-from swarm import Swarm, Agent
+from core.db import get_db
+from models.content import CreateContentDto, CreateCurriculumDto
+from typing import List, Optional
+from swarm import Agent
+from core.agents import run_agents_concurrently, stream_agent
+from core.streaming import sse_event, sse_response
+from core.response_cache import response_cache
 from dotenv import load_dotenv
+import asyncio
+import logging
+import os
+import re
 
 from pydantic import BaseModel
 
 
 from langchain_core.messages import AIMessage, HumanMessage 
-from langchain_community.document_loaders import WebBaseLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import Chroma
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.chains import create_history_aware_retriever, create_retrieval_chain
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_community.vectorstores import Chroma
+from core.rag import get_rag_chain, WEB_QA
+from core.vectorstores import get_ready_vectorstore, submit_url_indexing
+from core.jobs import curriculum_queue, accepted, JobQueueFull
+from core.pagination import PAGE_SIZE, MAX_PAGE_SIZE, KEYSET_ORDER, keyset_where, page, summary_page
+from core.read_cache import read_cache, CONTENT_PUBLIC, content_tag
+from core.content_index import content_index
 
 
 ################################ FROM WEB ##########################################################################
 
 chat_history = [AIMessage(content="Hello, I'm a bot. How can I help you today?"), HumanMessage(content="You will be making a summary content or ellaborated content based on a topic from the website.")]
-vector_store_cache = {}
 
 class QueryRequest(BaseModel):
     website_url: str
@@ -33,49 +38,10 @@ class QueryResponse(BaseModel):
     response: str
 
 
-def get_vectorstore_from_url(url):
+async def get_response(user_query, vector_store):
 
-    loader = WebBaseLoader(url)
-    document = loader.load()
-    text_spliter = RecursiveCharacterTextSplitter()
-    document_chunks = text_spliter.split_documents(document)
-    vectorstore = Chroma.from_documents(document_chunks, OpenAIEmbeddings())
-
-    return vectorstore
-
-
-def get_context_retriever_chain(vectorstore):
-
-    llm = ChatOpenAI()
-    retriever = vectorstore.as_retriever()
-    prompt = ChatPromptTemplate.from_messages([
-        MessagesPlaceholder(variable_name="chat_history"),
-        ("user", "{input}"),
-        ("user", "Given the above conversation, generate a search query to look up in order to get information relevant to the conversation")
-    ])
-    retriever_chain = create_history_aware_retriever(llm, retriever, prompt)
-
-    return retriever_chain
-
-
-def get_conversational_rag_chain(retriever_chain):   
-
-    llm = ChatOpenAI()  
-    prompt = ChatPromptTemplate.from_messages([
-      ("system", "Answer the user's questions based on the below context:\n\n{context}"),
-      MessagesPlaceholder(variable_name="chat_history"),
-      ("user", "{input}"),
-    ])  
-    stuff_documents_chain = create_stuff_documents_chain(llm, prompt)
-    
-    return create_retrieval_chain(retriever_chain, stuff_documents_chain)
-
-
-def get_response(user_query, vector_store):
-
-    retriever_chain = get_context_retriever_chain(vector_store)
-    conversation_rag_chain = get_conversational_rag_chain(retriever_chain)
-    response = conversation_rag_chain.invoke({
+    conversation_rag_chain = get_rag_chain(vector_store, WEB_QA, "content_create_from_web", templated=True)
+    response = await conversation_rag_chain.ainvoke({
             "chat_history": chat_history,
             "input": user_query
         })
@@ -85,9 +51,18 @@ def get_response(user_query, vector_store):
 
 
 ##########################################################################################################################
-# Load environment variables and initialize Swarm
+# Load environment variables
 load_dotenv()
-client = Swarm()
+
+logger = logging.getLogger(__name__)
+
+# Shared deadline for the theory/code/syntax generations. With the "partial"
+# policy a section that fails or times out is stored as NULL as long as one
+# section succeeded; "strict" rejects the request instead.
+CONTENT_GENERATION_TIMEOUT = float(os.getenv("CONTENT_GENERATION_TIMEOUT", "90"))
+CONTENT_FAILURE_POLICY = os.getenv("CONTENT_FAILURE_POLICY", "partial")
+# Topics of a curriculum generated at once, each running three agents
+CURRICULUM_CONCURRENCY = int(os.getenv("CURRICULUM_CONCURRENCY", "5"))
 
 
 # AI Agents
@@ -123,149 +98,331 @@ async def chat_with_website(query: QueryRequest):
     if not website_url or not question:
         raise HTTPException(status_code=400, detail="Both 'website_url' and 'question' are required.")
 
-    # Load or retrieve vector store
-    if website_url not in vector_store_cache:
-        try:
-            vector_store_cache[website_url] = get_vectorstore_from_url(website_url)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to process website URL: {str(e)}")
-
-    vector_store = vector_store_cache[website_url]
+    # Use the stored index, or queue indexing and let the client poll the job
+    try:
+        vector_store = await get_ready_vectorstore(website_url)
+        if vector_store is None:
+            return accepted(submit_url_indexing(website_url), "Indexing the website. Retry once the job has succeeded.")
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Too many indexing jobs waiting: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to process website URL: {str(e)}")
 
     # Get response from the vector store and model
     try:
-        response = get_response(q, vector_store=vector_store)
+        response = await get_response(q, vector_store=vector_store)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating response: {str(e)}")
 
     return QueryResponse(response=response)
 
 
-@router.post("/create")
-async def create_content(content: CreateContentDto):
-    db = Prisma()
-    await db.connect()
-    
+def section_jobs(prompt):
+    messages = [{"role": "user", "content": prompt}]
+    return {
+        "theory": (content_theory_agent, messages),
+        "code": (content_code_agent, messages),
+        "syntax": (content_syntax_agent, messages),
+    }
+
+
+async def reusable_sections(db, content):
+    """``(source, sections)`` of a near-identical public content, or None."""
+    if not content.reuse or not content_index.enabled:
+        return None
     try:
-        # Generate content using AI agents
-        theory_response = client.run(
-            agent=content_theory_agent,
-            messages=[{"role": "user", "content": content.prompt}]
-        )
-        
-        code_response = client.run(
-            agent=content_code_agent,
-            messages=[{"role": "user", "content": content.prompt}]
-        )
-        
-        syntax_response = client.run(
-            agent=content_syntax_agent,
-            messages=[{"role": "user", "content": content.prompt}]
-        )
+        match = await content_index.match(content.title, content.prompt)
+    except Exception:
+        logger.exception("Content reuse lookup failed, generating instead")
+        return None
+    if match is None:
+        return None
+    source = await db.content.find_unique(where={"id": match[0]})
+    if not source or not source.public:
+        return None
+    logger.info("reusing content %s (similarity %.3f)", source.id, match[1])
+    return source, {"theory": source.contentTheory, "code": source.contentCodes, "syntax": source.contentSyntax}
+
+
+async def save_content(db, content, sections, reused=False):
+    new_content = await db.content.create(
+        data={
+            "title": content.title,
+            "prompt": content.prompt,
+            "contentTheory": sections.get("theory"),
+            "contentCodes": sections.get("code"),
+            "contentSyntax": sections.get("syntax"),
+            "public": content.public,
+            "userId": content.userId,
+        }
+    )
+    if new_content.public:
+        await read_cache.invalidate(CONTENT_PUBLIC)
+        if not reused and len(sections) == 3:
+            await content_index.add([{"id": new_content.id, "title": new_content.title, "prompt": new_content.prompt}])
+    return new_content
 
-        # Create content in database
-        new_content = await db.content.create(
-            data={
-                "title": content.title,
-                "prompt": content.prompt,
-                "contentTheory": theory_response.messages[-1]["content"],
-                "contentCodes": code_response.messages[-1]["content"],
-                "contentSyntax": syntax_response.messages[-1]["content"],
-                "public": content.public,
-                "userId": content.userId,
-            }
-        )
-        return new_content
-    finally:
-        await db.disconnect()
 
 @router.post("/create")
-async def create_content(content: CreateContentDto):
-    db = Prisma()
-    await db.connect()
-    
-    try:
-        # Generate content using AI agents
-        theory_response = client.run(
-            agent=content_theory_agent,
-            messages=[{"role": "user", "content": content.prompt}]
-        )
-        
-        code_response = client.run(
-            agent=content_code_agent,
-            messages=[{"role": "user", "content": content.prompt}]
-        )
-        
-        syntax_response = client.run(
-            agent=content_syntax_agent,
-            messages=[{"role": "user", "content": content.prompt}]
+async def create_content(content: CreateContentDto, response: Response, db: Prisma = Depends(get_db)):
+    reusable = await reusable_sections(db, content)
+    if reusable:
+        source, sections = reusable
+        response.headers["X-Reused-From"] = source.id
+        return await save_content(db, content, sections, reused=True)
+
+    # Generate the three sections concurrently
+    sections, errors, timings = await run_agents_concurrently(
+        section_jobs(content.prompt),
+        timeout=CONTENT_GENERATION_TIMEOUT,
+        cache_prefix="content",
+    )
+
+    response.headers["Server-Timing"] = ", ".join(
+        f"{name};dur={seconds * 1000:.0f}" for name, seconds in timings.items()
+    )
+    logger.info("content sections generated in %s", {name: round(t, 2) for name, t in timings.items()})
+
+    if errors:
+        logger.warning("content section generation failed: %s", errors)
+        if CONTENT_FAILURE_POLICY == "strict" or not sections:
+            raise HTTPException(status_code=502, detail=f"Content generation failed: {errors}")
+        response.headers["X-Failed-Sections"] = ",".join(sorted(errors))
+
+    # Create content in database
+    new_content = await save_content(db, content, sections)
+    return new_content
+
+
+@router.post("/create/stream")
+async def stream_content(content: CreateContentDto, db: Prisma = Depends(get_db)):
+    """Stream the three sections as they are generated, then store the content."""
+
+    async def events():
+        reusable = await reusable_sections(db, content)
+        if reusable:
+            source, sections = reusable
+            for name, text in sections.items():
+                yield sse_event({"section": name, "content": text}, event="token")
+                yield sse_event({"section": name}, event="section_done")
+            new_content = await save_content(db, content, sections, reused=True)
+            yield sse_event({"content": new_content, "failedSections": [], "reusedFrom": source.id}, event="done")
+            return
+
+        queue = asyncio.Queue()
+        sections, errors = {}, {}
+
+        async def pump(name, agent, messages):
+            cache_name = f"content_{name}"
+            try:
+                if response_cache.enabled(cache_name):
+                    cached = await response_cache.get(cache_name, content.prompt)
+                    if cached is not None:
+                        sections[name] = cached
+                        await queue.put(sse_event({"section": name, "content": cached}, event="token"))
+                        await queue.put(sse_event({"section": name}, event="section_done"))
+                        return
+                async for item in stream_agent(agent, messages):
+                    if isinstance(item, str):
+                        await queue.put(sse_event({"section": name, "content": item}, event="token"))
+                    else:
+                        sections[name] = item.messages[-1]["content"]
+                        if response_cache.enabled(cache_name):
+                            await response_cache.put(cache_name, content.prompt, sections[name])
+                        await queue.put(sse_event({"section": name}, event="section_done"))
+            except Exception as e:
+                errors[name] = str(e)
+                await queue.put(sse_event({"section": name, "detail": str(e)}, event="section_error"))
+            finally:
+                await queue.put(None)
+
+        jobs = section_jobs(content.prompt)
+        tasks = [asyncio.create_task(pump(name, agent, messages)) for name, (agent, messages) in jobs.items()]
+        # The deadline only bounds the waits, so a timeout never lands inside a yield
+        deadline = asyncio.get_running_loop().time() + CONTENT_GENERATION_TIMEOUT
+        try:
+            remaining = len(tasks)
+            while remaining:
+                timeout = max(0.0, deadline - asyncio.get_running_loop().time())
+                message = await asyncio.wait_for(queue.get(), timeout)
+                if message is None:
+                    remaining -= 1
+                else:
+                    yield message
+        except TimeoutError:
+            for name in jobs:
+                if name not in sections and name not in errors:
+                    errors[name] = f"timed out after {CONTENT_GENERATION_TIMEOUT}s"
+                    yield sse_event({"section": name, "detail": errors[name]}, event="section_error")
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        if errors and (CONTENT_FAILURE_POLICY == "strict" or not sections):
+            yield sse_event({"detail": f"Content generation failed: {errors}"}, event="error")
+            return
+
+        new_content = await save_content(db, content, sections)
+        yield sse_event({"content": new_content, "failedSections": sorted(errors)}, event="done")
+
+    return sse_response(events())
+
+# Unindented numbered lines only; indented sub-items belong to the topic above
+_TOPIC_LINE = re.compile(r"^\d+\s*[.)]\s*(.+)$")
+
+
+def parse_topic_list(topic_list):
+    """Topic names from the numbered list stored by /topics/create, in order."""
+    titles = []
+    for line in topic_list.splitlines():
+        match = _TOPIC_LINE.match(line)
+        if match:
+            title = match.group(1).strip().strip("*_").strip()
+            if title and title not in titles:
+                titles.append(title)
+    return titles
+
+
+async def generate_curriculum(job, db, topic, titles, request):
+    """Generate content for every topic title, saving each one as soon as it is done.
+
+    A title that fails is recorded in ``failed`` and does not stop the others;
+    contents already saved stay saved if the job is cancelled.
+    """
+    semaphore = asyncio.Semaphore(CURRICULUM_CONCURRENCY)
+    items = job.progress["items"] = {title: "queued" for title in titles}
+    job.progress["total"] = len(titles)
+    created, failed = {}, {}
+
+    async def generate(title):
+        content = CreateContentDto(
+            title=title,
+            prompt=f"{title} in {topic.promptName}",
+            public=request.public,
+            userId=request.userId,
+            reuse=request.reuse,
         )
+        async with semaphore:
+            items[title] = "generating"
+            reusable = await reusable_sections(db, content)
+            if reusable:
+                sections, errors = reusable[1], {}
+            else:
+                sections, errors, _ = await run_agents_concurrently(
+                    section_jobs(content.prompt),
+                    timeout=CONTENT_GENERATION_TIMEOUT,
+                    cache_prefix="content",
+                )
+        if errors and (CONTENT_FAILURE_POLICY == "strict" or not sections):
+            raise RuntimeError(f"Content generation failed: {errors}")
+        created[title] = await save_content(db, content, sections, reused=bool(reusable))
+        items[title] = "reused" if reusable else "generated"
+        job.advance("reused" if reusable else "generated")
+
+    async def attempt(title):
+        try:
+            await generate(title)
+        except Exception as e:
+            logger.exception("Curriculum item %r failed", title)
+            failed[title] = str(e)
+            items[title] = "failed"
+            job.advance("failed")
+
+    await asyncio.gather(*(attempt(title) for title in titles))
+    return {
+        "topicId": topic.id,
+        "contents": [{"id": created[title].id, "title": title} for title in titles if title in created],
+        "failed": failed,
+    }
+
+
+@router.post("/create_batch")
+async def create_curriculum(request: CreateCurriculumDto, db: Prisma = Depends(get_db)):
+    """Generate content for every topic in a Topic's list as a background job.
+
+    Poll /jobs/{job_id} for per-topic progress; the result lists the created
+    content IDs.
+    """
+    topic = await db.topic.find_unique(where={"id": request.topicId})
+    if not topic:
+        raise HTTPException(status_code=404, detail="Topic not found")
+    titles = parse_topic_list(topic.topicList)
+    if not titles:
+        raise HTTPException(status_code=422, detail="The topic list has no numbered topics")
 
-        # Create content in database
-        new_content = await db.content.create(
-            data={
-                "title": content.title,
-                "prompt": content.prompt,
-                "contentTheory": theory_response.messages[-1]["content"],
-                "contentCodes": code_response.messages[-1]["content"],
-                "contentSyntax": syntax_response.messages[-1]["content"],
-                "public": content.public,
-                "userId": content.userId,
-            }
+    try:
+        job = curriculum_queue.submit(
+            "curriculum",
+            lambda job: generate_curriculum(job, db, topic, titles, request),
+            key=("curriculum", topic.id, request.userId),
         )
-        return new_content
-    finally:
-        await db.disconnect()
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Too many jobs waiting: {str(e)}")
+    return accepted(job, f"Generating content for {len(titles)} topics.")
+
+
+CONTENT_SUMMARY_COLUMNS = ["id", "title", "userId", "createdAt"]
 
 @router.get("/public")
-async def get_public_content():
-    db = Prisma()
-    await db.connect()
-    try:
-        return await db.content.find_many(
-            where={"public": True},
-            include={"user": True}
+async def get_public_content(
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    summary: bool = False,
+    db: Prisma = Depends(get_db),
+):
+    """Page through public content, newest first.
+
+    Pass the returned ``nextCursor`` as ``cursor`` for the next page. With
+    ``summary`` the theory, code and syntax text is left out.
+    """
+    async def load():
+        if summary:
+            return await summary_page(db, "Content", CONTENT_SUMMARY_COLUMNS, "public = true", [], limit, cursor)
+        contents = await db.content.find_many(
+            where={"public": True, **keyset_where(cursor)},
+            include={"user": True},
+            order=KEYSET_ORDER,
+            take=limit + 1
         )
-    finally:
-        await db.disconnect()
+        return page(contents, limit)
+
+    return await read_cache.get_or_load(CONTENT_PUBLIC, f"{limit}:{cursor}:{summary}", load)
 
 @router.get("/public/titles", response_model=List[str])
-async def get_public_titles():
-    db = Prisma()
-    await db.connect()
+async def get_public_titles(
+    response: Response,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Prisma = Depends(get_db),
+):
+    """Titles of public content, newest first; the next cursor is in X-Next-Cursor."""
     try:
-        contents = await db.content.find_many(
-            where={"public": True}
-        )
-        return [content.title for content in contents]
+        titles = await summary_page(db, "Content", ["id", "title", "createdAt"], "public = true", [], limit, cursor)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        await db.disconnect()
+    if titles["nextCursor"]:
+        response.headers["X-Next-Cursor"] = titles["nextCursor"]
+    return [row["title"] for row in titles["items"]]
 
 @router.get("/{content_id}")
-async def get_content_by_id(content_id: str):
-    db = Prisma()
-    await db.connect()
-    try:
-        content = await db.content.find_unique(
+async def get_content_by_id(content_id: str, db: Prisma = Depends(get_db)):
+    content = await read_cache.get_or_load(
+        content_tag(content_id),
+        "",
+        lambda: db.content.find_unique(
             where={"id": content_id},
             include={"user": True, "mentorLogs": True}
-        )
-        if not content:
-            raise HTTPException(status_code=404, detail="Content not found")
-        return content
-    finally:
-        await db.disconnect()
+        ),
+    )
+    if not content:
+        raise HTTPException(status_code=404, detail="Content not found")
+    return content
 
 @router.get("/user/{user_id}")
-async def get_user_content(user_id: str):
-    db = Prisma()
-    await db.connect()
-    try:
-        return await db.content.find_many(
-            where={"userId": user_id},
-            include={"mentorLogs": True}
-        )
-    finally:
-        await db.disconnect()
\ No newline at end of file
+async def get_user_content(user_id: str, db: Prisma = Depends(get_db)):
+    return await db.content.find_many(
+        where={"userId": user_id},
+        include={"mentorLogs": True}
+    )
\ No newline at end of file
@@ -0,0 +1,40 @@
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+
+from core.jobs import find_job, accepted, JobQueueFull
+from core.vectorstores import submit_url_indexing, submit_revalidation
+
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+class IndexUrlRequest(BaseModel):
+    url: str
+
+
+@router.post("/index_url")
+async def index_url(request: IndexUrlRequest):
+    """Index a website ahead of the /topics, /content and /quiz web endpoints."""
+    try:
+        job = submit_url_indexing(request.url)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Too many indexing jobs waiting: {str(e)}")
+    return accepted(job, "Indexing the website.")
+
+
+@router.post("/revalidate_url")
+async def revalidate_url(request: IndexUrlRequest):
+    """Re-fetch an indexed website if it changed, re-embedding only changed chunks."""
+    try:
+        job = submit_revalidation(request.url)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Too many indexing jobs waiting: {str(e)}")
+    return accepted(job, "Revalidating the website.")
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str):
+    job = find_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job.to_dict()
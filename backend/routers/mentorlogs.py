@@ -1,13 +1,35 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
 from prisma import Prisma
+from core.db import get_db
 from models.mentorlog import CreateMentorLogDto
 from typing import List
-from swarm import Swarm, Agent
+from swarm import Agent
+from core.agents import run_agent, run_agents_concurrently, stream_agent
+from core.streaming import sse_event, sse_response
+from core.read_cache import read_cache, content_tag
+import asyncio
 from dotenv import load_dotenv
+import logging
+import os
+import re
 
-# Load environment variables and initialize Swarm
+# Load environment variables
 load_dotenv()
-client = Swarm()
+
+logger = logging.getLogger(__name__)
+
+# How mentor log titles are produced:
+#   llm      - title_agent runs concurrently with the answer
+#   local    - extractive title from the question, no LLM call
+#   deferred - local title first, title_agent result written after the response
+MENTOR_TITLE_MODE = os.getenv("MENTOR_TITLE_MODE", "llm")
+TITLE_MODES = {"llm", "local", "deferred"}
+TITLE_MAX_WORDS = 7
+
+_FILLER_PREFIX = re.compile(
+    r"^(?:(?:hi|hello|hey|please|so|ok|okay)\b[\s,!.]*|(?:can|could|would) you\s+(?:please\s+)?|i (?:don'?t|do not) understand\s+)+",
+    re.IGNORECASE,
+)
 
 # AI Agents
 code_explanation_agent = Agent(
@@ -33,14 +55,37 @@ teacher_agent = Agent(
     instructions="You are a great teacher. Help user to understand code or text."
 )
 
+def extract_title(context, question):
+    """Cheap extractive title: the first sentence of the question, trimmed."""
+    text = question.strip() or context.strip()
+    sentence = re.split(r"(?<=[.?!])\s+|\n", text, maxsplit=1)[0]
+    sentence = _FILLER_PREFIX.sub("", sentence).strip(" .?!:;,")
+    words = sentence.split()
+    if not words:
+        return "Untitled question"
+    title = " ".join(words[:TITLE_MAX_WORDS])
+    return title[0].upper() + title[1:]
+
+
+async def fill_in_title(db, log_id, messages):
+    """Replace the provisional title with the title_agent one."""
+    try:
+        title_response = await run_agent(title_agent, messages)
+        log = await db.mentorlog.update(
+            where={"id": log_id},
+            data={"title": title_response.messages[-1]["content"]}
+        )
+        if log:
+            await read_cache.invalidate(content_tag(log.contentId))
+    except Exception:
+        logger.exception("Deferred title generation failed for mentor log %s", log_id)
+
+
 router = APIRouter(prefix="/mentor", tags=["mentor"])
 
 @router.post("/create")
-async def create_mentor_log(mentor_log: CreateMentorLogDto):
+async def create_mentor_log(mentor_log: CreateMentorLogDto, background_tasks: BackgroundTasks, db: Prisma = Depends(get_db)):
     """Create a new mentor log with AI-generated content"""
-    db = Prisma()
-    await db.connect()
-    
     try:
         # Verify content exists
         content = await db.content.find_unique(
@@ -51,25 +96,31 @@ async def create_mentor_log(mentor_log: CreateMentorLogDto):
         if not content:
             raise HTTPException(status_code=404, detail="Content not found")
             
-        # Generate title using AI
-        title_response = client.run(
-            agent=title_agent,
-            messages=[{"role": "user", "content": f"context: {mentor_log.context}. The question is {mentor_log.question}. "}],
-        )
-        
-        # Generate response using AI
-        response_msg = client.run(
-            agent=teacher_agent,
-            messages=[{"role": "user", "content": f"context: {mentor_log.context}. The question is {mentor_log.question}. "}],
-        )
+        title_mode = mentor_log.titleMode or MENTOR_TITLE_MODE
+        if title_mode not in TITLE_MODES:
+            raise HTTPException(status_code=422, detail=f"titleMode must be one of {sorted(TITLE_MODES)}")
+
+        messages = [{"role": "user", "content": f"context: {mentor_log.context}. The question is {mentor_log.question}. "}]
+        jobs = {"answer": (teacher_agent, messages)}
+        if title_mode == "llm" and not mentor_log.title:
+            jobs["title"] = (title_agent, messages)
+
+        # Generate title and response concurrently
+        replies, errors, _ = await run_agents_concurrently(jobs)
+        if "answer" in errors:
+            raise HTTPException(status_code=400, detail=errors["answer"])
+        if "title" in errors:
+            logger.warning("Title generation failed, using local title: %s", errors["title"])
+
+        title = mentor_log.title or replies.get("title") or extract_title(mentor_log.context, mentor_log.question)
 
         # Create mentor log in database
         new_log = await db.mentorlog.create(
             data={
-                "title": title_response.messages[-1]["content"],
+                "title": title,
                 "context": mentor_log.context,
                 "question": mentor_log.question,
-                "response": response_msg.messages[-1]["content"],
+                "response": replies["answer"],
                 "userId": mentor_log.userId,
                 "contentId": mentor_log.contentId,
             },
@@ -78,52 +129,108 @@ async def create_mentor_log(mentor_log: CreateMentorLogDto):
                 "content": True
             }
         )
+        # The log shows up in the cached GET /content/{id}
+        await read_cache.invalidate(content_tag(mentor_log.contentId))
+        if title_mode == "deferred" and not mentor_log.title:
+            background_tasks.add_task(fill_in_title, db, new_log.id, messages)
         return new_log
-        
+
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        await db.disconnect()
 
 
-@router.get("/content/{content_id}")
-async def get_content_mentor_logs(content_id: str):
-    """Get all mentor logs for a specific content"""
-    db = Prisma()
-    await db.connect()
-    
-    try:
-        logs = await db.mentorlog.find_many(
-            where={
-                "contentId": content_id
+@router.post("/create/stream")
+async def stream_mentor_log(mentor_log: CreateMentorLogDto, background_tasks: BackgroundTasks, db: Prisma = Depends(get_db)):
+    """Stream the AI answer, then store the mentor log"""
+    content = await db.content.find_unique(
+        where={
+            "id": mentor_log.contentId
+        }
+    )
+    if not content:
+        raise HTTPException(status_code=404, detail="Content not found")
+
+    title_mode = mentor_log.titleMode or MENTOR_TITLE_MODE
+    if title_mode not in TITLE_MODES:
+        raise HTTPException(status_code=422, detail=f"titleMode must be one of {sorted(TITLE_MODES)}")
+
+    messages = [{"role": "user", "content": f"context: {mentor_log.context}. The question is {mentor_log.question}. "}]
+
+    async def events():
+        title_task = None
+        if title_mode == "llm" and not mentor_log.title:
+            title_task = asyncio.create_task(run_agent(title_agent, messages))
+
+        try:
+            answer = None
+            async for item in stream_agent(teacher_agent, messages):
+                if isinstance(item, str):
+                    yield sse_event({"content": item}, event="token")
+                else:
+                    answer = item.messages[-1]["content"]
+
+            title = mentor_log.title
+            if title_task is not None:
+                try:
+                    title = (await title_task).messages[-1]["content"]
+                except Exception as e:
+                    logger.warning("Title generation failed, using local title: %s", e)
+            title = title or extract_title(mentor_log.context, mentor_log.question)
+        finally:
+            if title_task is not None and not title_task.done():
+                title_task.cancel()
+
+        new_log = await db.mentorlog.create(
+            data={
+                "title": title,
+                "context": mentor_log.context,
+                "question": mentor_log.question,
+                "response": answer,
+                "userId": mentor_log.userId,
+                "contentId": mentor_log.contentId,
             },
             include={
                 "user": True,
                 "content": True
             }
         )
-        return logs
-    finally:
-        await db.disconnect()
+        # The log shows up in the cached GET /content/{id}
+        await read_cache.invalidate(content_tag(mentor_log.contentId))
+        if title_mode == "deferred" and not mentor_log.title:
+            background_tasks.add_task(fill_in_title, db, new_log.id, messages)
+        yield sse_event({"log": new_log}, event="done")
+
+    return sse_response(events(), background=background_tasks)
+
+
+@router.get("/content/{content_id}")
+async def get_content_mentor_logs(content_id: str, db: Prisma = Depends(get_db)):
+    """Get all mentor logs for a specific content"""
+    logs = await db.mentorlog.find_many(
+        where={
+            "contentId": content_id
+        },
+        include={
+            "user": True,
+            "content": True
+        }
+    )
+    return logs
 
 @router.get("/{mentor_log_id}")
-async def get_mentor_log_by_id(mentor_log_id: str):
+async def get_mentor_log_by_id(mentor_log_id: str, db: Prisma = Depends(get_db)):
     """Get a specific mentor log by ID"""
-    db = Prisma()
-    await db.connect()
-    
-    try:
-        log = await db.mentorlog.find_unique(
-            where={
-                "id": mentor_log_id
-            },
-            include={
-                "user": True,
-                "content": True
-            }
-        )
-        if not log:
-            raise HTTPException(status_code=404, detail="MentorLog not found")
-        return log
-    finally:
-        await db.disconnect()
\ No newline at end of file
+    log = await db.mentorlog.find_unique(
+        where={
+            "id": mentor_log_id
+        },
+        include={
+            "user": True,
+            "content": True
+        }
+    )
+    if not log:
+        raise HTTPException(status_code=404, detail="MentorLog not found")
+    return log
\ No newline at end of file
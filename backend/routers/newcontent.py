@@ -1,11 +1,8 @@
 from langchain_openai import ChatOpenAI
-from langchain_chroma import Chroma
-from langchain_openai import OpenAIEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from core.indexes import index_store, MultiSourceRetriever
 from langchain.chains import create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_community.document_loaders import WebBaseLoader, PyPDFLoader
 from langchain.chains import create_history_aware_retriever
 from langchain_core.messages import AIMessage, HumanMessage
 
@@ -13,9 +10,6 @@ from langchain_core.messages import AIMessage, HumanMessage
 # Initialize LLM
 llm = ChatOpenAI(model="gpt-4o")
 
-# Setup text splitter
-text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-
 # Create system prompt
 system_prompt = (
     "You are a mentor who teaches step-by-step, interactively and adaptively. "
@@ -29,19 +23,9 @@ system_prompt = (
 
 # Process documents into a retriever
 def process_documents(sources):
-    documents = []
-
-    for source in sources:
-        if source.endswith(".pdf"):
-            loader = PyPDFLoader(source)
-        else:
-            loader = WebBaseLoader(source)
-        documents.extend(loader.load())
-
-    document_chunks = text_splitter.split_documents(documents)
-    vectorstore = Chroma.from_documents(document_chunks, OpenAIEmbeddings())
+    vectorstores = [vectorstore for vectorstore, _ in index_store.load_many(sources, profile="tutoring")]
 
-    return vectorstore.as_retriever()
+    return MultiSourceRetriever(vectorstores=vectorstores)
 
 
 # Create a conversational RAG chain
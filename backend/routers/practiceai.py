@@ -10,8 +10,14 @@ from pydantic import BaseModel
 # from langchain.chains.combine_documents import create_stuff_documents_chain
 # from langchain_core.messages import AIMessage, HumanMessage
 # import os
-from swarm import Swarm, Agent
+from swarm import Agent
+from core.agents import run_agent, stream_agent
+from core.coalesce import LatestOnly
+from core.streaming import sse_response, agent_events
 from dotenv import load_dotenv
+from typing import Optional
+import hashlib
+import os
 
 from fastapi import APIRouter, HTTPException
 
@@ -40,13 +46,21 @@ class LiveRequest(BaseModel):
     topic: str 
     language: str 
     user_code: str 
+    # Any stable ID of the learner or editor; enables coalescing of live feedback
+    userId: Optional[str] = None
 
 class QueryResponse(BaseModel):
     response: str
 
 
 load_dotenv()
-client = Swarm()
+
+# Minimum seconds between live feedback calls for one learner and problem
+LIVE_TRACKING_MIN_INTERVAL = float(os.getenv("LIVE_TRACKING_MIN_INTERVAL", "2"))
+# After this long a caller gets the in-flight feedback instead of it being cancelled
+LIVE_TRACKING_MAX_WAIT = float(os.getenv("LIVE_TRACKING_MAX_WAIT", "10"))
+
+live_tracking = LatestOnly(min_interval=LIVE_TRACKING_MIN_INTERVAL, max_wait=LIVE_TRACKING_MAX_WAIT)
 
 problem_creation_agent = Agent(
     instructions=(
@@ -93,31 +107,65 @@ problem_solve_helper = Agent(
 )
 
 
+def create_messages(request):
+    return [{"role": "user", "content": f"user specification: {request.user_specification}. Topic and language: {request.topic} {request.language}. Difficulty: {request.difficulty}"}]
+
+
+def modify_messages(request):
+    return [{"role": "user", "content": f"user specification: {request.user_specification}. Topic and language: {request.topic} {request.language}. Difficulty: {request.difficulty}. But user wants {request.user_wants} problem"}]
+
+
+def live_tracking_messages(request):
+    return [{"role": "user", "content": f"Topic and language: {request.topic} {request.language}.  Given Problem {request.given_problem} user current progress {request.user_code}."}]
+
+
 @router.post("/create")
 async def create_a_problem(request: QueryRequest):
-    response = client.run(
+    response = await run_agent(
             agent=problem_creation_agent,
-            messages=[{"role": "user", "content": f"user specification: {request.user_specification}. Topic and language: {request.topic} {request.language}. Difficulty: {request.difficulty}"}],
+            messages=create_messages(request),
         )
 
     return response.messages[-1]["content"]
 
 
+@router.post("/create/stream")
+async def stream_a_problem(request: QueryRequest):
+    return sse_response(agent_events(problem_creation_agent, create_messages(request)))
+
+
 @router.post("/modify")
 async def create_a_problem(request: QueryRequestModify):
-    response = client.run(
+    response = await run_agent(
             agent=problem_modifying_agent,
-            messages=[{"role": "user", "content": f"user specification: {request.user_specification}. Topic and language: {request.topic} {request.language}. Difficulty: {request.difficulty}. But user wants {request.user_wants} problem"}],
+            messages=modify_messages(request),
         )
 
     return response.messages[-1]["content"]
 
 
+@router.post("/modify/stream")
+async def stream_a_modified_problem(request: QueryRequestModify):
+    return sse_response(agent_events(problem_modifying_agent, modify_messages(request)))
+
+
+async def live_feedback(request):
+    # Streamed so that cancelling a superseded call also closes its LLM request
+    async for item in stream_agent(problem_solve_helper, live_tracking_messages(request)):
+        if not isinstance(item, str):
+            return item.messages[-1]["content"]
+
+
 @router.post("/live_tracking")
 async def create_a_problem(request: LiveRequest):
-    response = client.run(
-            agent=problem_solve_helper,
-            messages=[{"role": "user", "content": f"Topic and language: {request.topic} {request.language}.  Given Problem {request.given_problem} user current progress {request.user_code}."}],
-        )
+    if request.userId is None:
+        return await live_feedback(request)
+
+    # Snapshots of the same learner and problem share one call, newest code wins
+    problem = hashlib.sha256(request.given_problem.encode("utf-8")).hexdigest()
+    return await live_tracking.submit((request.userId, problem), lambda: live_feedback(request))
+
 
-    return response.messages[-1]["content"]
\ No newline at end of file
+@router.post("/live_tracking/stream")
+async def stream_live_tracking(request: LiveRequest):
+    return sse_response(agent_events(problem_solve_helper, live_tracking_messages(request)))
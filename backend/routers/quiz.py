@@ -9,14 +9,9 @@ from pydantic import BaseModel
 
 
 from langchain_core.messages import AIMessage, HumanMessage 
-from langchain_community.document_loaders import WebBaseLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import Chroma
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.chains import create_history_aware_retriever, create_retrieval_chain
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_community.vectorstores import Chroma
+from core.rag import get_rag_chain, WEB_QA
+from core.vectorstores import get_ready_vectorstore, submit_url_indexing
+from core.jobs import accepted, JobQueueFull
 
 
 load_dotenv()
@@ -24,50 +19,10 @@ load_dotenv()
 ################################ FROM WEB ##########################################################################
 
 chat_history = [AIMessage(content="Hello, I'm a bot. How can I help you today?"), HumanMessage(content="You will create 15 quizes with multiple choices (4 choices). on the topic you are given based on the website. Add 10 informative type question and 5 question that will evaluate if the user understood the topic or not. Only generate questions with number bulletins. dont generate any extra sentences.")]
-vector_store_cache = {}
-def get_vectorstore_from_url(url):
+async def get_response(user_query, vector_store, endpoint):
 
-    loader = WebBaseLoader(url)
-    document = loader.load()
-    text_spliter = RecursiveCharacterTextSplitter()
-    document_chunks = text_spliter.split_documents(document)
-    vectorstore = Chroma.from_documents(document_chunks, OpenAIEmbeddings())
-
-    return vectorstore
-
-
-def get_context_retriever_chain(vectorstore):
-
-    llm = ChatOpenAI()
-    retriever = vectorstore.as_retriever()
-    prompt = ChatPromptTemplate.from_messages([
-        MessagesPlaceholder(variable_name="chat_history"),
-        ("user", "{input}"),
-        ("user", "Given the above conversation, generate a search query to look up in order to get information relevant to the conversation")
-    ])
-    retriever_chain = create_history_aware_retriever(llm, retriever, prompt)
-
-    return retriever_chain
-
-
-def get_conversational_rag_chain(retriever_chain):   
-
-    llm = ChatOpenAI()  
-    prompt = ChatPromptTemplate.from_messages([
-      ("system", "Answer the user's questions based on the below context:\n\n{context}"),
-      MessagesPlaceholder(variable_name="chat_history"),
-      ("user", "{input}"),
-    ])  
-    stuff_documents_chain = create_stuff_documents_chain(llm, prompt)
-    
-    return create_retrieval_chain(retriever_chain, stuff_documents_chain)
-
-
-def get_response(user_query, vector_store):
-
-    retriever_chain = get_context_retriever_chain(vector_store)
-    conversation_rag_chain = get_conversational_rag_chain(retriever_chain)
-    response = conversation_rag_chain.invoke({
+    conversation_rag_chain = get_rag_chain(vector_store, WEB_QA, endpoint, templated=True)
+    response = await conversation_rag_chain.ainvoke({
             "chat_history": chat_history,
             "input": user_query
         })
@@ -102,18 +57,19 @@ async def chat_with_website(query: QueryRequest):
     if not website_url or not topic:
         raise HTTPException(status_code=400, detail="Both 'website_url' and 'topic' are required.")
 
-    # Load or retrieve vector store
-    if website_url not in vector_store_cache:
-        try:
-            vector_store_cache[website_url] = get_vectorstore_from_url(website_url)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to process website URL: {str(e)}")
-
-    vector_store = vector_store_cache[website_url]
+    # Use the stored index, or queue indexing and let the client poll the job
+    try:
+        vector_store = await get_ready_vectorstore(website_url)
+        if vector_store is None:
+            return accepted(submit_url_indexing(website_url), "Indexing the website. Retry once the job has succeeded.")
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Too many indexing jobs waiting: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to process website URL: {str(e)}")
 
     # Get response from the vector store and model
     try:
-        response = get_response(question, vector_store=vector_store)
+        response = await get_response(question, vector_store=vector_store, endpoint="quiz_create_from_web")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating response: {str(e)}")
 
@@ -135,18 +91,19 @@ async def chat_with_website(query: EvaluationRequest):
     if not website_url or not topic:
         raise HTTPException(status_code=400, detail="Both 'website_url' and 'topic' are required.")
 
-    # Load or retrieve vector store
-    if website_url not in vector_store_cache:
-        try:
-            vector_store_cache[website_url] = get_vectorstore_from_url(website_url)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to process website URL: {str(e)}")
-
-    vector_store = vector_store_cache[website_url]
+    # Use the stored index, or queue indexing and let the client poll the job
+    try:
+        vector_store = await get_ready_vectorstore(website_url)
+        if vector_store is None:
+            return accepted(submit_url_indexing(website_url), "Indexing the website. Retry once the job has succeeded.")
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Too many indexing jobs waiting: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to process website URL: {str(e)}")
 
     # Get response from the vector store and model
     try:
-        response = get_response(question, vector_store=vector_store)
+        response = await get_response(question, vector_store=vector_store, endpoint="quiz_evaluate")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating response: {str(e)}")
 
@@ -168,18 +125,19 @@ async def chat_with_website(query: EvaluationRequest):
     if not website_url or not topic:
         raise HTTPException(status_code=400, detail="Both 'website_url' and 'topic' are required.")
 
-    # Load or retrieve vector store
-    if website_url not in vector_store_cache:
-        try:
-            vector_store_cache[website_url] = get_vectorstore_from_url(website_url)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to process website URL: {str(e)}")
-
-    vector_store = vector_store_cache[website_url]
+    # Use the stored index, or queue indexing and let the client poll the job
+    try:
+        vector_store = await get_ready_vectorstore(website_url)
+        if vector_store is None:
+            return accepted(submit_url_indexing(website_url), "Indexing the website. Retry once the job has succeeded.")
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Too many indexing jobs waiting: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to process website URL: {str(e)}")
 
     # Get response from the vector store and model
     try:
-        response = get_response(question, vector_store=vector_store)
+        response = await get_response(question, vector_store=vector_store, endpoint="quiz_recreate_from_web")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating response: {str(e)}")
 
@@ -0,0 +1,29 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from prisma import Prisma
+from core.db import get_db
+from core.pagination import PAGE_SIZE, MAX_PAGE_SIZE
+from core.search import SEARCH_SOURCES, search
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+@router.get("")
+async def search_public(
+    q: str = Query(..., min_length=1, max_length=200),
+    types: Optional[List[str]] = Query(None),
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: Prisma = Depends(get_db),
+):
+    """
+    Search public content, topics and mentor logs, best match first.
+
+    ``types`` narrows the search to some of content, topic and mentor_log.
+    Pass the returned ``nextCursor`` as ``cursor`` for the next page.
+    """
+    kinds = types or list(SEARCH_SOURCES)
+    unknown = set(kinds) - set(SEARCH_SOURCES)
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"types must be among {sorted(SEARCH_SOURCES)}")
+    return await search(db, q, kinds, limit, cursor)
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from prisma import Prisma
+from core.db import get_db
 from models.topic import CreateTopicDto
-from typing import List
-from swarm import Swarm, Agent
+from typing import List, Optional
+from swarm import Agent
+from core.agents import agent_reply
 from dotenv import load_dotenv
 
 from pydantic import BaseModel
@@ -10,63 +12,21 @@ from pydantic import BaseModel
 
 import streamlit as st
 from langchain_core.messages import AIMessage, HumanMessage 
-from langchain_community.document_loaders import WebBaseLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import Chroma
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.chains import create_history_aware_retriever, create_retrieval_chain
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_community.vectorstores import Chroma
+from core.rag import get_rag_chain, WEB_QA
+from core.vectorstores import get_ready_vectorstore, submit_url_indexing
+from core.jobs import accepted, JobQueueFull
+from core.pagination import PAGE_SIZE, MAX_PAGE_SIZE, KEYSET_ORDER, keyset_where, page, summary_page
+from core.read_cache import read_cache, TOPICS_PUBLIC, topic_tag
 
 
 ################################ FROM WEB ##########################################################################
 
 chat_history = [AIMessage(content="Hello, I'm a bot. How can I help you today?"), HumanMessage(content="You will make a list of topics that is needed to be learnt. If not given any specific instruction generate a topic list based on the website given. List only the topics starting with number bulletins.")]
 
-def get_vectorstore_from_url(url):
+async def get_response(user_query, vector_store):
 
-    loader = WebBaseLoader(url)
-    document = loader.load()
-    text_spliter = RecursiveCharacterTextSplitter()
-    document_chunks = text_spliter.split_documents(document)
-    vectorstore = Chroma.from_documents(document_chunks, OpenAIEmbeddings())
-
-    return vectorstore
-
-
-def get_context_retriever_chain(vectorstore):
-
-    llm = ChatOpenAI()
-    retriever = vectorstore.as_retriever()
-    prompt = ChatPromptTemplate.from_messages([
-        MessagesPlaceholder(variable_name="chat_history"),
-        ("user", "{input}"),
-        ("user", "Given the above conversation, generate a search query to look up in order to get information relevant to the conversation")
-    ])
-    retriever_chain = create_history_aware_retriever(llm, retriever, prompt)
-
-    return retriever_chain
-
-
-def get_conversational_rag_chain(retriever_chain):   
-
-    llm = ChatOpenAI()  
-    prompt = ChatPromptTemplate.from_messages([
-      ("system", "Answer the user's questions based on the below context:\n\n{context}"),
-      MessagesPlaceholder(variable_name="chat_history"),
-      ("user", "{input}"),
-    ])  
-    stuff_documents_chain = create_stuff_documents_chain(llm, prompt)
-    
-    return create_retrieval_chain(retriever_chain, stuff_documents_chain)
-
-
-def get_response(user_query, vector_store):
-
-    retriever_chain = get_context_retriever_chain(vector_store)
-    conversation_rag_chain = get_conversational_rag_chain(retriever_chain)
-    response = conversation_rag_chain.invoke({
+    conversation_rag_chain = get_rag_chain(vector_store, WEB_QA, "topics_create_from_web", templated=True)
+    response = await conversation_rag_chain.ainvoke({
             "chat_history": chat_history,
             "input": user_query
         })
@@ -78,7 +38,6 @@ def get_response(user_query, vector_store):
 ##########################################################################################################################
 
 
-vector_store_cache = {}
 
 class QueryRequest(BaseModel):
     website_url: str
@@ -90,7 +49,6 @@ class QueryResponse(BaseModel):
 
 
 load_dotenv()
-client = Swarm()
 
 
 topic_agent_advanced = Agent(
@@ -125,103 +83,107 @@ async def chat_with_website(query: QueryRequest):
     if not website_url or not question:
         raise HTTPException(status_code=400, detail="Both 'website_url' and 'question' are required.")
 
-    # Load or retrieve vector store
-    if website_url not in vector_store_cache:
-        try:
-            vector_store_cache[website_url] = get_vectorstore_from_url(website_url)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Failed to process website URL: {str(e)}")
-
-    vector_store = vector_store_cache[website_url]
+    # Use the stored index, or queue indexing and let the client poll the job
+    try:
+        vector_store = await get_ready_vectorstore(website_url)
+        if vector_store is None:
+            return accepted(submit_url_indexing(website_url), "Indexing the website. Retry once the job has succeeded.")
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Too many indexing jobs waiting: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to process website URL: {str(e)}")
 
     # Get response from the vector store and model
     try:
-        response = get_response(question, vector_store=vector_store)
+        response = await get_response(question, vector_store=vector_store)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating response: {str(e)}")
 
     return QueryResponse(response=response)
 
 @router.post("/create")
-async def create_topic(topic: CreateTopicDto):
-    db = Prisma()
-    await db.connect()
-    
+async def create_topic(topic: CreateTopicDto, db: Prisma = Depends(get_db)):
     try:
-        response = client.run(
-            agent=topic_agent,
-            messages=[{"role": "user", "content": f"{topic.promptName}"}],
+        topic_list = await agent_reply(
+            topic_agent,
+            [{"role": "user", "content": f"{topic.promptName}"}],
+            cache_name="topic",
         )
-        
+
         new_topic = await db.topic.create(
             data={
                 "promptName": topic.promptName,
-                "topicList": response.messages[-1]["content"],
+                "topicList": topic_list,
                 "public": topic.public,
                 "userId": topic.userId,
             }
         )
+        if new_topic.public:
+            await read_cache.invalidate(TOPICS_PUBLIC)
         return new_topic
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        await db.disconnect()
 
 @router.get("/public")
-async def get_public_topics():
-    """Get all public topics"""
-    db = Prisma()
-    await db.connect()
-    
-    try:
+async def get_public_topics(
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    summary: bool = False,
+    db: Prisma = Depends(get_db),
+):
+    """Page through public topics, newest first.
+
+    Pass the returned ``nextCursor`` as ``cursor`` for the next page. With
+    ``summary`` only id, promptName, userId and createdAt are returned.
+    """
+    async def load():
+        if summary:
+            return await summary_page(
+                db, "Topic", ["id", "promptName", "userId", "createdAt"], "public = true", [], limit, cursor
+            )
         topics = await db.topic.find_many(
             where={
-                "public": True
+                "public": True,
+                **keyset_where(cursor)
             },
             include={
                 "user": True
-            }
+            },
+            order=KEYSET_ORDER,
+            take=limit + 1
         )
-        return topics
-    finally:
-        await db.disconnect()
+        return page(topics, limit)
+
+    return await read_cache.get_or_load(TOPICS_PUBLIC, f"{limit}:{cursor}:{summary}", load)
 
 @router.get("/{topic_id}")
-async def get_topic(topic_id: str):
+async def get_topic(topic_id: str, db: Prisma = Depends(get_db)):
     """Get a topic by ID"""
-    db = Prisma()
-    await db.connect()
-    
-    try:
-        topic = await db.topic.find_unique(
+    topic = await read_cache.get_or_load(
+        topic_tag(topic_id),
+        "",
+        lambda: db.topic.find_unique(
             where={
                 "id": topic_id
             },
             include={
                 "user": True
             }
-        )
-        if not topic:
-            raise HTTPException(status_code=404, detail="Topic not found")
-        return topic
-    finally:
-        await db.disconnect()
+        ),
+    )
+    if not topic:
+        raise HTTPException(status_code=404, detail="Topic not found")
+    return topic
 
 @router.get("/user/{user_id}")
-async def get_user_topics(user_id: str):
+async def get_user_topics(user_id: str, db: Prisma = Depends(get_db)):
     """Get all topics for a user"""
-    db = Prisma()
-    await db.connect()
-    
-    try:
-        topics = await db.topic.find_many(
-            where={
-                "userId": user_id
-            },
-            include={
-                "user": True
-            }
-        )
-        return topics
-    finally:
-        await db.disconnect()
\ No newline at end of file
+    topics = await db.topic.find_many(
+        where={
+            "userId": user_id
+        },
+        include={
+            "user": True
+        }
+    )
+    return topics
\ No newline at end of file
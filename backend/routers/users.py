@@ -1,16 +1,39 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
 from prisma import Prisma
+from core.db import get_db
+from core.pagination import PAGE_SIZE, MAX_PAGE_SIZE, KEYSET_ORDER, keyset_where, page, summary_page
 
 router = APIRouter(prefix="/users", tags=["users"])
 
+# Relation -> (table, Prisma model accessor, summary columns)
+USER_RELATIONS = {
+    "topics": ("Topic", "topic", ["id", "promptName", "createdAt"]),
+    "contents": ("Content", "content", ["id", "title", "createdAt"]),
+    "mentorLogs": ("MentorLog", "mentorlog", ["id", "title", "contentId", "createdAt"]),
+}
+USER_LATEST_ITEMS = 5
+
+
+async def find_user(db, user_id):
+    user = await db.user.find_unique(where={"id": user_id})
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
+
+def latest_items(db, relation, clerk_user_id, limit, cursor=None):
+    table, _, columns = USER_RELATIONS[relation]
+    return summary_page(db, table, columns, '"userId" = $1', [clerk_user_id], limit, cursor)
+
+
 @router.post("/create")
-async def create_user(user: dict):
+async def create_user(user: dict, db: Prisma = Depends(get_db)):
     """
     Insert a new user record.
     """
-    db = Prisma()
-    await db.connect()
-    
     try:
         new_user = await db.user.create(
             data={
@@ -19,45 +42,81 @@ async def create_user(user: dict):
                 "name": user.get("name"),
                 "imageUrl": user.get("imageUrl"),
                 "credit": user.get("credit", 0)
-            },
-            include={
-                "topics": True,
-                "contents": True
             }
         )
         return new_user
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
-    finally:
-        await db.disconnect()
 
 @router.get("/{user_id}")
-async def get_user(user_id: str):
+async def get_user(
+    user_id: str,
+    latest: int = Query(USER_LATEST_ITEMS, ge=1, le=MAX_PAGE_SIZE),
+    db: Prisma = Depends(get_db),
+):
     """
-    Get a user by their clerk ID along with their topics and contents.
+    Get a user with counts and the latest topics, contents and mentor logs.
+
+    Items are id/title projections, newest first. Each relation's
+    ``nextCursor`` continues in its paginated sub-endpoint.
     """
-    db = Prisma()
-    await db.connect()
-    
-    try:
-        user = await db.user.find_unique(
-            where={
-                "id": user_id
-            },
-            include={
-                "topics": True,
-                "contents": True,
-                "mentorLogs": True
-            }
-        )
-        
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-            
-        return {
-            "user": user,
-            "topics": user.topics,
-            "contents": user.contents
-        }
-    finally:
-        await db.disconnect()
\ No newline at end of file
+    user = await find_user(db, user_id)
+    counts, *pages = await asyncio.gather(
+        db.query_raw(
+            'SELECT (SELECT COUNT(*) FROM "Topic" WHERE "userId" = $1) AS topics, '
+            '(SELECT COUNT(*) FROM "Content" WHERE "userId" = $1) AS contents, '
+            '(SELECT COUNT(*) FROM "MentorLog" WHERE "userId" = $1) AS "mentorLogs"',
+            user.clerkUserId,
+        ),
+        *(latest_items(db, relation, user.clerkUserId, latest) for relation in USER_RELATIONS),
+    )
+    return {
+        "user": user,
+        "counts": {relation: int(counts[0][relation]) for relation in USER_RELATIONS},
+        **dict(zip(USER_RELATIONS, pages)),
+    }
+
+async def user_relation_page(db, user_id, relation, limit, cursor, summary):
+    user = await find_user(db, user_id)
+    if summary:
+        return await latest_items(db, relation, user.clerkUserId, limit, cursor)
+    _, model, _ = USER_RELATIONS[relation]
+    rows = await getattr(db, model).find_many(
+        where={"userId": user.clerkUserId, **keyset_where(cursor)},
+        order=KEYSET_ORDER,
+        take=limit + 1
+    )
+    return page(rows, limit)
+
+@router.get("/{user_id}/topics")
+async def get_user_topics(
+    user_id: str,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    summary: bool = False,
+    db: Prisma = Depends(get_db),
+):
+    """Page through a user's topics, newest first."""
+    return await user_relation_page(db, user_id, "topics", limit, cursor, summary)
+
+@router.get("/{user_id}/contents")
+async def get_user_contents(
+    user_id: str,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    summary: bool = False,
+    db: Prisma = Depends(get_db),
+):
+    """Page through a user's contents, newest first."""
+    return await user_relation_page(db, user_id, "contents", limit, cursor, summary)
+
+@router.get("/{user_id}/mentor_logs")
+async def get_user_mentor_logs(
+    user_id: str,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    summary: bool = False,
+    db: Prisma = Depends(get_db),
+):
+    """Page through a user's mentor logs, newest first."""
+    return await user_relation_page(db, user_id, "mentorLogs", limit, cursor, summary)
@@ -0,0 +1,23 @@
+-- DropIndex
+DROP INDEX "Topic_userId_idx";
+
+-- DropIndex
+DROP INDEX "Content_userId_idx";
+
+-- DropIndex
+DROP INDEX "MentorLog_userId_idx";
+
+-- CreateIndex
+CREATE INDEX "Topic_userId_createdAt_id_idx" ON "Topic"("userId", "createdAt" DESC, "id" DESC);
+
+-- CreateIndex
+CREATE INDEX "Topic_public_createdAt_id_idx" ON "Topic"("public", "createdAt" DESC, "id" DESC);
+
+-- CreateIndex
+CREATE INDEX "Content_userId_createdAt_id_idx" ON "Content"("userId", "createdAt" DESC, "id" DESC);
+
+-- CreateIndex
+CREATE INDEX "Content_public_createdAt_id_idx" ON "Content"("public", "createdAt" DESC, "id" DESC);
+
+-- CreateIndex
+CREATE INDEX "MentorLog_userId_createdAt_id_idx" ON "MentorLog"("userId", "createdAt" DESC, "id" DESC);
@@ -0,0 +1,30 @@
+-- Prisma has no syntax for generated columns, so the schema declares "search"
+-- as Unsupported("tsvector") and this migration defines how Postgres fills it.
+-- The regconfig is spelled out so the expressions are immutable.
+
+-- AlterTable
+ALTER TABLE "Topic" ADD COLUMN "search" tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('english'::regconfig, coalesce("promptName", '')), 'A') ||
+    setweight(to_tsvector('english'::regconfig, coalesce("topicList", '')), 'B')
+) STORED;
+
+-- AlterTable
+ALTER TABLE "Content" ADD COLUMN "search" tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('english'::regconfig, coalesce("title", '')), 'A') ||
+    setweight(to_tsvector('english'::regconfig, coalesce("contentTheory", '')), 'B')
+) STORED;
+
+-- AlterTable
+ALTER TABLE "MentorLog" ADD COLUMN "search" tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('english'::regconfig, coalesce("title", '')), 'A') ||
+    setweight(to_tsvector('english'::regconfig, coalesce("question", '')), 'B')
+) STORED;
+
+-- CreateIndex
+CREATE INDEX "Topic_search_idx" ON "Topic" USING GIN ("search");
+
+-- CreateIndex
+CREATE INDEX "Content_search_idx" ON "Content" USING GIN ("search");
+
+-- CreateIndex
+CREATE INDEX "MentorLog_search_idx" ON "MentorLog" USING GIN ("search");
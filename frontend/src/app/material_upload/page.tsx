@@ -45,10 +45,24 @@ export default function MaterialUploadPage() {
 
       if (!sourcesResponse.ok) throw new Error('Failed to load sources');
 
+      // Sources are indexed in a background job, poll it for the retriever
+      let job = await sourcesResponse.json();
+      while (job.status === 'queued' || job.status === 'running') {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        const jobResponse = await fetch(`http://localhost:8000/jobs/${job.job_id}`);
+        if (!jobResponse.ok) throw new Error('Failed to load sources');
+        job = await jobResponse.json();
+      }
+      if (job.status !== 'succeeded') throw new Error(job.error || 'Failed to load sources');
+
+      const { retriever_id } = job.result;
+      sessionStorage.setItem('retrieverId', retriever_id);
+
       const topicsResponse = await fetch('http://localhost:8000/newcontent/topic_list', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
+          retriever_id,
           specific_section: materials.question,
           chat_history: [{
             role: "system",
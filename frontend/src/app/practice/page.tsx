@@ -23,6 +23,7 @@ interface TrackingRequest {
     topic: string;
     language: string;
     user_code: string;
+    userId: string;
   }
 
 interface CodeProps {
@@ -80,6 +81,8 @@ export default function PracticePage() {
   const [loading, setLoading] = useState(false);
   const [modifyLoading, setModifyLoading] = useState(false);
   const [error, setError] = useState<string>('');
+  // Lets the server coalesce live feedback requests from this editor
+  const [trackingId] = useState(() => crypto.randomUUID());
 
     // Add live tracking effect
     const debouncedTracking = useCallback(
@@ -94,7 +97,8 @@ export default function PracticePage() {
                 given_problem: problem,
                 topic: problemSpec.topic,
                 language: problemSpec.language,
-                user_code: currentCode
+                user_code: currentCode,
+                userId: trackingId
               } as TrackingRequest),
             });
     
@@ -105,7 +109,7 @@ export default function PracticePage() {
             console.error('Tracking error:', err);
           }
         }, 1000), // 1 second delay after stopping typing
-        [problem, problemSpec.topic, problemSpec.language]
+        [problem, problemSpec.topic, problemSpec.language, trackingId]
       );
 
 
@@ -81,7 +81,10 @@ export default function QuizPage() {
         const response = await fetch('http://localhost:8000/newcontent/take_quiz', {
           method: 'POST',
           headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({ chat_history: chatHistory }),
+          body: JSON.stringify({
+            retriever_id: sessionStorage.getItem('retrieverId'),
+            chat_history: chatHistory
+          }),
         });
 
         if (!response.ok) throw new Error('Failed to fetch quiz');
@@ -143,6 +146,7 @@ export default function QuizPage() {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
+          retriever_id: sessionStorage.getItem('retrieverId'),
           prompt: "",
           topic: searchParams.get('topic'),
           chat_history: [
@@ -134,6 +134,7 @@ export default function TopicDetailsPage() {
             'Content-Type': 'application/json',
           },
           body: JSON.stringify({
+            retriever_id: sessionStorage.getItem('retrieverId'),
             prompt: "Start teaching about this topic",
             topic: topic,
             chat_history: []
@@ -191,6 +192,7 @@ export default function TopicDetailsPage() {
           'Content-Type': 'application/json',
         },
         body: JSON.stringify({
+          retriever_id: sessionStorage.getItem('retrieverId'),
           prompt: `My answers are: ${formattedAnswers}`,
           topic: topic,
           chat_history: chatHistory